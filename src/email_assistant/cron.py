@@ -1,64 +1,60 @@
 import os
 import sys
 import asyncio
-from typing import Dict, Any, TypedDict
-from dataclasses import dataclass, field
+import logging
+from types import SimpleNamespace
+from typing import Dict, Any
+from typing_extensions import Required, TypedDict
 from langgraph.graph import StateGraph, START, END
-from email_assistant.tools.gmail.run_ingest import fetch_and_process_emails
+from email_assistant.tools.gmail.run_ingest import MAX_CONCURRENCY, fetch_and_process_emails
 
-@dataclass(kw_only=True)
-class JobKickoff:
+logger = logging.getLogger(__name__)
+
+class JobKickoff(TypedDict, total=False):
     """State for the email ingestion cron job"""
-    email: str
-    minutes_since: int = 60
-    graph_name: str = "email_assistant_hitl_memory_gmail"
-    url: str = "http://127.0.0.1:2024"
-    include_read: bool = False
-    rerun: bool = False
-    early: bool = False
-    skip_filters: bool = False
+    email: Required[str]
+    minutes_since: int
+    graph_name: str
+    url: str
+    include_read: bool
+    rerun: bool
+    early: bool
+    skip_filters: bool
+    max_concurrency: int
+    # Set by the job when it finishes
+    status: str
+    exit_code: int
+    error: str
+
+# Defaults for the optional job inputs
+JOB_DEFAULTS = {
+    "minutes_since": 60,
+    "graph_name": "email_assistant_hitl_memory_gmail",
+    "url": "http://127.0.0.1:2024",
+    "include_read": False,
+    "rerun": False,
+    "early": False,
+    "skip_filters": False,
+    "max_concurrency": MAX_CONCURRENCY,
+}
 
 async def main(state: JobKickoff):
     """Run the email ingestion process"""
-    print(f"Kicking off job to fetch emails from the past {state.minutes_since} minutes")
-    print(f"Email: {state.email}")
-    print(f"URL: {state.url}")
-    print(f"Graph name: {state.graph_name}")
+    # fetch_and_process_emails reads its options as attributes, like parsed CLI args
+    args = SimpleNamespace(**{**JOB_DEFAULTS, **state})
+    logger.info(
+        "Kicking off job to fetch emails from the past %s minutes (email=%s, url=%s, graph=%s)",
+        args.minutes_since, args.email, args.url, args.graph_name,
+    )
     
     try:
-        # Convert state to args object for fetch_and_process_emails
-        class Args:
-            def __init__(self, **kwargs):
-                for key, value in kwargs.items():
-                    setattr(self, key, value)
-                print(f"Created Args with attributes: {dir(self)}")
-        
-        args = Args(
-            email=state.email,
-            minutes_since=state.minutes_since,
-            graph_name=state.graph_name,
-            url=state.url,
-            include_read=state.include_read,
-            rerun=state.rerun,
-            early=state.early,
-            skip_filters=state.skip_filters
-        )
-        
-        # Print email and URL to verify they're being passed correctly
-        print(f"Args email: {args.email}")
-        print(f"Args url: {args.url}")
-        
-        # Run the ingestion process
-        print("Starting fetch_and_process_emails...")
         result = await fetch_and_process_emails(args)
-        print(f"fetch_and_process_emails returned: {result}")
+        logger.debug("fetch_and_process_emails returned: %s", result)
         
         # Return the result status
         return {"status": "success" if result == 0 else "error", "exit_code": result}
     except Exception as e:
-        import traceback
-        print(f"Error in cron job: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in cron job")
         return {"status": "error", "error": str(e)}
 
 # Build the graph
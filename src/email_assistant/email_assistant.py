@@ -1,7 +1,11 @@
+import logging
+from functools import cache
 from typing import Literal
 
 from langchain.chat_models import init_chat_model
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 
+from email_assistant.http_clients import get_http_client, get_http_async_client
 from email_assistant.tools import get_tools, get_tools_by_name
 from email_assistant.tools.default.prompt_templates import AGENT_TOOLS_PROMPT
 from email_assistant.prompts import triage_system_prompt, triage_user_prompt, agent_system_prompt, default_background, default_triage_instructions, default_response_preferences, default_cal_preferences
@@ -13,17 +17,50 @@ from langgraph.types import Command
 from dotenv import load_dotenv
 load_dotenv(".env")
 
+logger = logging.getLogger(__name__)
+
 # Get tools
 tools = get_tools()
 tools_by_name = get_tools_by_name(tools)
 
-# Initialize the LLM for use with router / structured output
-llm = init_chat_model("openai:gpt-4.1", temperature=0.0)
-llm_router = llm.with_structured_output(RouterSchema) 
+# The LLMs are created on first use rather than at import time
+@cache
+def get_llm():
+    """Get the chat model shared by the router and the agent"""
+    # The system prompts are static prefixes, so a fixed cache key helps OpenAI reuse cached prompt tokens
+    return init_chat_model(
+        "openai:gpt-4.1",
+        temperature=0.0,
+        extra_body={"prompt_cache_key": "email_assistant"},
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client(),
+    )
+
+@cache
+def get_llm_router():
+    """Get the LLM for use with router / structured output"""
+    return get_llm().with_structured_output(RouterSchema)
+
+@cache
+def get_llm_with_tools():
+    """Get the LLM, enforcing tool use (of any available tools) for agent"""
+    return get_llm().bind_tools(tools, tool_choice="any")
+
+# Format the system prompts once, since all of their inputs are module-level constants
+AGENT_SYSTEM_PROMPT = agent_system_prompt.format(
+    tools_prompt=AGENT_TOOLS_PROMPT,
+    background=default_background,
+    response_preferences=default_response_preferences,
+    cal_preferences=default_cal_preferences,
+)
+TRIAGE_SYSTEM_PROMPT = triage_system_prompt.format(
+    background=default_background,
+    triage_instructions=default_triage_instructions,
+)
 
-# Initialize the LLM, enforcing tool use (of any available tools) for agent
-llm = init_chat_model("openai:gpt-4.1", temperature=0.0)
-llm_with_tools = llm.bind_tools(tools, tool_choice="any")
+# The system messages never change, so build them once and reuse them for every call
+AGENT_SYSTEM_MESSAGE = {"role": "system", "content": AGENT_SYSTEM_PROMPT}
+TRIAGE_SYSTEM_MESSAGE = {"role": "system", "content": TRIAGE_SYSTEM_PROMPT}
 
 # Nodes
 def llm_call(state: State):
@@ -31,28 +68,32 @@ def llm_call(state: State):
 
     return {
         "messages": [
-            llm_with_tools.invoke(
-                [
-                    {"role": "system", "content": agent_system_prompt.format(
-                        tools_prompt=AGENT_TOOLS_PROMPT,
-                        background=default_background,
-                        response_preferences=default_response_preferences, 
-                        cal_preferences=default_cal_preferences)
-                    },
-                    
-                ]
-                + state["messages"]
+            get_llm_with_tools().invoke(
+                [AGENT_SYSTEM_MESSAGE, *state["messages"]]
             )
         ]
     }
 
+def run_tool(tool_call):
+    """Invoke the tool named in a tool call with its arguments"""
+    return tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+
 def tool_node(state: State):
-    """Performs the tool call"""
+    """Performs the tool calls"""
+
+    tool_calls = state["messages"][-1].tool_calls
+
+    # A single tool call, the usual case, runs directly without starting a thread pool
+    if len(tool_calls) == 1:
+        observations = [run_tool(tool_calls[0])]
+    else:
+        # Tools are I/O bound, so run them concurrently; map preserves the tool call order
+        # The context-aware executor keeps tracing callbacks attached to this run
+        with ContextThreadPoolExecutor(max_workers=max(len(tool_calls), 1)) as executor:
+            observations = list(executor.map(run_tool, tool_calls))
 
     result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
+    for tool_call, observation in zip(tool_calls, observations):
         result.append({"role": "tool", "content" : observation, "tool_call_id": tool_call["id"]})
     return {"messages": result}
 
@@ -62,11 +103,12 @@ def should_continue(state: State) -> Literal["Action", "__end__"]:
     messages = state["messages"]
     last_message = messages[-1]
     if last_message.tool_calls:
-        for tool_call in last_message.tool_calls: 
-            if tool_call["name"] == "Done":
-                return END
-            else:
-                return "Action"
+        # End only when Done is the only call in the turn; any other call (e.g. a reply) still has to be
+        # reviewed and run first, and the agent calls Done again once it has
+        if all(tool_call["name"] == "Done" for tool_call in last_message.tool_calls):
+            return END
+        return "Action"
+    return END
 
 # Build workflow
 agent_builder = StateGraph(State)
@@ -89,7 +131,8 @@ agent_builder.add_conditional_edges(
 agent_builder.add_edge("environment", "llm_call")
 
 # Compile the agent
-agent = agent_builder.compile()
+# The agent loop never interrupts, so it skips checkpointing its intermediate steps
+agent = agent_builder.compile(checkpointer=False)
 
 def triage_router(state: State) -> Command[Literal["response_agent", "__end__"]]:
     """Analyze email content to decide if we should respond, notify, or ignore.
@@ -100,22 +143,15 @@ def triage_router(state: State) -> Command[Literal["response_agent", "__end__"]]
     - Messages meant for other teams
     """
     author, to, subject, email_thread = parse_email(state["email_input"])
-    system_prompt = triage_system_prompt.format(
-        background=default_background,
-        triage_instructions=default_triage_instructions
-    )
 
     user_prompt = triage_user_prompt.format(
         author=author, to=to, subject=subject, email_thread=email_thread
     )
 
-    # Create email markdown for Agent Inbox in case of notification  
-    email_markdown = format_email_markdown(subject, author, to, email_thread)
-
     # Run the router LLM
-    result = llm_router.invoke(
+    result = get_llm_router().invoke(
         [
-            {"role": "system", "content": system_prompt},
+            TRIAGE_SYSTEM_MESSAGE,
             {"role": "user", "content": user_prompt},
         ]
     )
@@ -124,8 +160,10 @@ def triage_router(state: State) -> Command[Literal["response_agent", "__end__"]]
     classification = result.classification
 
     if classification == "respond":
-        print("📧 Classification: RESPOND - This email requires a response")
+        logger.info("📧 Classification: RESPOND - This email requires a response")
         goto = "response_agent"
+        # Create email markdown only when the agent needs it to write a response
+        email_markdown = format_email_markdown(subject, author, to, email_thread)
         # Add the email to the messages
         update = {
             "classification_decision": result.classification,
@@ -134,14 +172,14 @@ def triage_router(state: State) -> Command[Literal["response_agent", "__end__"]]
                         }],
         }
     elif result.classification == "ignore":
-        print("🚫 Classification: IGNORE - This email can be safely ignored")
+        logger.info("🚫 Classification: IGNORE - This email can be safely ignored")
         update =  {
             "classification_decision": result.classification,
         }
         goto = END
     elif result.classification == "notify":
         # If real life, this would do something else
-        print("🔔 Classification: NOTIFY - This email contains important information")
+        logger.info("🔔 Classification: NOTIFY - This email contains important information")
         update = {
             "classification_decision": result.classification,
         }
@@ -1,10 +1,14 @@
+import logging
+from functools import cache
 from typing import Literal
 
 from langchain.chat_models import init_chat_model
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import interrupt, Command
 
+from email_assistant.http_clients import get_http_client, get_http_async_client
 from email_assistant.tools import get_tools, get_tools_by_name
 from email_assistant.tools.default.prompt_templates import HITL_TOOLS_PROMPT
 from email_assistant.prompts import triage_system_prompt, triage_user_prompt, agent_system_prompt_hitl, default_background, default_triage_instructions, default_response_preferences, default_cal_preferences
@@ -14,17 +18,58 @@ from dotenv import load_dotenv
 
 load_dotenv(".env")
 
+logger = logging.getLogger(__name__)
+
 # Get tools
 tools = get_tools(["write_email", "schedule_meeting", "check_calendar_availability", "Question", "Done"])
 tools_by_name = get_tools_by_name(tools)
 
-# Initialize the LLM for use with router / structured output
-llm = init_chat_model("openai:gpt-4.1", temperature=0.0)
-llm_router = llm.with_structured_output(RouterSchema) 
+# The LLMs are created on first use rather than at import time
+@cache
+def get_llm():
+    """Get the chat model shared by the router and the agent"""
+    # The system prompts are static prefixes, so a fixed cache key helps OpenAI reuse cached prompt tokens
+    return init_chat_model(
+        "openai:gpt-4.1",
+        temperature=0.0,
+        extra_body={"prompt_cache_key": "email_assistant_hitl"},
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client(),
+    )
+
+@cache
+def get_llm_router():
+    """Get the LLM for use with router / structured output"""
+    return get_llm().with_structured_output(RouterSchema)
+
+@cache
+def get_llm_with_tools():
+    """Get the LLM, enforcing tool use (of any available tools) for agent"""
+    return get_llm().bind_tools(tools, tool_choice="required")
+
+# Format the system prompts once, since all of their inputs are module-level constants
+AGENT_SYSTEM_PROMPT = agent_system_prompt_hitl.format(
+    tools_prompt=HITL_TOOLS_PROMPT,
+    background=default_background,
+    response_preferences=default_response_preferences,
+    cal_preferences=default_cal_preferences,
+)
+TRIAGE_SYSTEM_PROMPT = triage_system_prompt.format(
+    background=default_background,
+    triage_instructions=default_triage_instructions,
+)
+
+# The system messages never change, so build them once and reuse them for every call
+AGENT_SYSTEM_MESSAGE = {"role": "system", "content": AGENT_SYSTEM_PROMPT}
+TRIAGE_SYSTEM_MESSAGE = {"role": "system", "content": TRIAGE_SYSTEM_PROMPT}
 
-# Initialize the LLM, enforcing tool use (of any available tools) for agent
-llm = init_chat_model("openai:gpt-4.1", temperature=0.0)
-llm_with_tools = llm.bind_tools(tools, tool_choice="required")
+def get_email_markdown(state: State) -> str:
+    """Get the email markdown stored by triage_router, formatting it from email_input if it's missing"""
+    # Threads started before triage_router stored the markdown don't have it in their state
+    if "email_markdown" in state:
+        return state["email_markdown"]
+    author, to, subject, email_thread = parse_email(state["email_input"])
+    return format_email_markdown(subject, author, to, email_thread)
 
 # Nodes 
 def triage_router(state: State) -> Command[Literal["triage_interrupt_handler", "response_agent", "__end__"]]:
@@ -42,19 +87,10 @@ def triage_router(state: State) -> Command[Literal["triage_interrupt_handler", "
         author=author, to=to, subject=subject, email_thread=email_thread
     )
 
-    # Create email markdown for Agent Inbox in case of notification  
-    email_markdown = format_email_markdown(subject, author, to, email_thread)
-
-    # Format system prompt with background and triage instructions
-    system_prompt = triage_system_prompt.format(
-        background=default_background,
-        triage_instructions=default_triage_instructions
-    )
-
     # Run the router LLM
-    result = llm_router.invoke(
+    result = get_llm_router().invoke(
         [
-            {"role": "system", "content": system_prompt},
+            TRIAGE_SYSTEM_MESSAGE,
             {"role": "user", "content": user_prompt},
         ]
     )
@@ -64,18 +100,21 @@ def triage_router(state: State) -> Command[Literal["triage_interrupt_handler", "
 
     # Process the classification decision
     if classification == "respond":
-        print("📧 Classification: RESPOND - This email requires a response")
+        logger.info("📧 Classification: RESPOND - This email requires a response")
         # Next node
         goto = "response_agent"
-        # Update the state
+        # Create email markdown only when the agent needs it to write a response
+        email_markdown = format_email_markdown(subject, author, to, email_thread)
+        # Update the state, keeping the markdown so later nodes don't parse the email again
         update = {
             "classification_decision": result.classification,
+            "email_markdown": email_markdown,
             "messages": [{"role": "user",
                             "content": f"Respond to the email: {email_markdown}"
                         }],
         }
     elif classification == "ignore":
-        print("🚫 Classification: IGNORE - This email can be safely ignored")
+        logger.info("🚫 Classification: IGNORE - This email can be safely ignored")
 
         # Next node
         goto = END
@@ -85,13 +124,16 @@ def triage_router(state: State) -> Command[Literal["triage_interrupt_handler", "
         }
 
     elif classification == "notify":
-        print("🔔 Classification: NOTIFY - This email contains important information") 
+        logger.info("🔔 Classification: NOTIFY - This email contains important information")
 
         # Next node
         goto = "triage_interrupt_handler"
+        # Create email markdown for Agent Inbox, keeping it so later nodes don't parse the email again
+        email_markdown = format_email_markdown(subject, author, to, email_thread)
         # Update the state
         update = {
             "classification_decision": classification,
+            "email_markdown": email_markdown,
         }
 
     else:
@@ -101,11 +143,8 @@ def triage_router(state: State) -> Command[Literal["triage_interrupt_handler", "
 def triage_interrupt_handler(state: State) -> Command[Literal["response_agent", "__end__"]]:
     """Handles interrupts from the triage step"""
     
-    # Parse the email input
-    author, to, subject, email_thread = parse_email(state["email_input"])
-
-    # Create email markdown for Agent Inbox in case of notification  
-    email_markdown = format_email_markdown(subject, author, to, email_thread)
+    # Email markdown for Agent Inbox in case of notification
+    email_markdown = get_email_markdown(state)
 
     # Create messages
     messages = [{"role": "user",
@@ -162,20 +201,47 @@ def llm_call(state: State):
 
     return {
         "messages": [
-            llm_with_tools.invoke(
-                [
-                    {"role": "system", "content": agent_system_prompt_hitl.format(
-                        tools_prompt=HITL_TOOLS_PROMPT,
-                        background=default_background,
-                        response_preferences=default_response_preferences, 
-                        cal_preferences=default_cal_preferences
-                    )}
-                ]
-                + state["messages"]
+            get_llm_with_tools().invoke(
+                [AGENT_SYSTEM_MESSAGE, *state["messages"]]
             )
         ]
     }
 
+# Actions allowed in Agent Inbox for each tool that needs review
+HITL_CONFIGS = {
+    "write_email": {
+        "allow_ignore": True,
+        "allow_respond": True,
+        "allow_edit": True,
+        "allow_accept": True,
+    },
+    "schedule_meeting": {
+        "allow_ignore": True,
+        "allow_respond": True,
+        "allow_edit": True,
+        "allow_accept": True,
+    },
+    "Question": {
+        "allow_ignore": True,
+        "allow_respond": True,
+        "allow_edit": False,
+        "allow_accept": False,
+    },
+}
+
+# Allowed tools for HITL
+HITL_TOOLS = frozenset(HITL_CONFIGS)
+
+def run_tools(tool_calls):
+    """Run tool calls concurrently and return their observations keyed by tool call ID"""
+    if len(tool_calls) <= 1:
+        return {tool_call["id"]: tools_by_name[tool_call["name"]].invoke(tool_call["args"]) for tool_call in tool_calls}
+
+    # The context-aware executor keeps tracing callbacks attached to this run
+    with ContextThreadPoolExecutor(max_workers=len(tool_calls)) as executor:
+        results = executor.map(lambda tool_call: tools_by_name[tool_call["name"]].invoke(tool_call["args"]), tool_calls)
+        return {tool_call["id"]: observation for tool_call, observation in zip(tool_calls, results)}
+
 def interrupt_handler(state: State) -> Command[Literal["llm_call", "__end__"]]:
     """Creates an interrupt for human review of tool calls"""
     
@@ -185,54 +251,27 @@ def interrupt_handler(state: State) -> Command[Literal["llm_call", "__end__"]]:
     # Go to the LLM call node next
     goto = "llm_call"
 
+    # Get original email, which is shown with every tool call sent to Agent Inbox
+    original_email_markdown = get_email_markdown(state)
+
+    # Execute search_memory and other tools that don't need review up front, running them concurrently
+    tool_calls = state["messages"][-1].tool_calls
+    observations = run_tools([tool_call for tool_call in tool_calls if tool_call["name"] not in HITL_TOOLS])
+
     # Iterate over the tool calls in the last message
-    for tool_call in state["messages"][-1].tool_calls:
-        
-        # Allowed tools for HITL
-        hitl_tools = ["write_email", "schedule_meeting", "Question"]
+    for tool_call in tool_calls:
         
-        # If tool is not in our HITL list, execute it directly without interruption
-        if tool_call["name"] not in hitl_tools:
-
-            # Execute search_memory and other tools without interruption
-            tool = tools_by_name[tool_call["name"]]
-            observation = tool.invoke(tool_call["args"])
-            result.append({"role": "tool", "content": observation, "tool_call_id": tool_call["id"]})
+        # If tool is not in our HITL list, use its result directly without interruption
+        if tool_call["name"] not in HITL_TOOLS:
+            result.append({"role": "tool", "content": observations[tool_call["id"]], "tool_call_id": tool_call["id"]})
             continue
             
-        # Get original email from email_input in state
-        email_input = state["email_input"]
-        author, to, subject, email_thread = parse_email(email_input)
-        original_email_markdown = format_email_markdown(subject, author, to, email_thread)
-        
         # Format tool call for display and prepend the original email
         tool_display = format_for_display(tool_call)
         description = original_email_markdown + tool_display
 
         # Configure what actions are allowed in Agent Inbox
-        if tool_call["name"] == "write_email":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": True,
-                "allow_accept": True,
-            }
-        elif tool_call["name"] == "schedule_meeting":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": True,
-                "allow_accept": True,
-            }
-        elif tool_call["name"] == "Question":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": False,
-                "allow_accept": False,
-            }
-        else:
-            raise ValueError(f"Invalid tool call: {tool_call['name']}")
+        config = HITL_CONFIGS[tool_call["name"]]
 
         # Create the interrupt request
         request = {
@@ -267,10 +306,11 @@ def interrupt_handler(state: State) -> Command[Literal["llm_call", "__end__"]]:
             ai_message = state["messages"][-1] # Get the most recent message from the state
             current_id = tool_call["id"] # Store the ID of the tool call being edited
             
-            # Create a new list of tool calls by filtering out the one being edited and adding the updated version
-            # This avoids modifying the original list directly (immutable approach)
-            updated_tool_calls = [tc for tc in ai_message.tool_calls if tc["id"] != current_id] + [
-                {"type": "tool_call", "name": tool_call["name"], "args": edited_args, "id": current_id}
+            # Create a new list of tool calls in one pass, swapping in the updated version of the one being edited
+            # This avoids modifying the original list directly (immutable approach) and keeps the tool calls in order
+            updated_tool_calls = [
+                {"type": "tool_call", "name": tool_call["name"], "args": edited_args, "id": current_id} if tc["id"] == current_id else tc
+                for tc in ai_message.tool_calls
             ]
 
             # Create a new copy of the message with updated tool calls rather than modifying the original
@@ -351,11 +391,12 @@ def should_continue(state: State) -> Literal["interrupt_handler", "__end__"]:
     messages = state["messages"]
     last_message = messages[-1]
     if last_message.tool_calls:
-        for tool_call in last_message.tool_calls: 
-            if tool_call["name"] == "Done":
-                return END
-            else:
-                return "interrupt_handler"
+        # End only when Done is the only call in the turn; any other call (e.g. a reply) still has to be
+        # reviewed and run first, and the agent calls Done again once it has
+        if all(tool_call["name"] == "Done" for tool_call in last_message.tool_calls):
+            return END
+        return "interrupt_handler"
+    return END
 
 # Build workflow
 agent_builder = StateGraph(State)
@@ -1,11 +1,18 @@
+import hashlib
+import logging
+import time
+from functools import cache, lru_cache
 from typing import Literal
 
 from langchain.chat_models import init_chat_model
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 
 from langgraph.graph import StateGraph, START, END
-from langgraph.store.base import BaseStore
+from langgraph.store.base import BaseStore, GetOp, PutOp
 from langgraph.types import interrupt, Command
 
+from email_assistant.http_clients import get_http_client, get_http_async_client
+from email_assistant.memory import MEMORY_CACHE_TTL_SECONDS, memory_cache, memory_update_keys, submit_memory_update, wait_for_memory_updates
 from email_assistant.tools import get_tools, get_tools_by_name
 from email_assistant.tools.gmail.prompt_templates import GMAIL_TOOLS_PROMPT
 from email_assistant.tools.gmail.gmail_tools import mark_as_read
@@ -16,17 +23,85 @@ from dotenv import load_dotenv
 
 load_dotenv(".env")
 
+logger = logging.getLogger(__name__)
+
 # Get tools with Gmail tools
 tools = get_tools(["send_email_tool", "schedule_meeting_tool", "check_calendar_tool", "Question", "Done"], include_gmail=True)
 tools_by_name = get_tools_by_name(tools)
 
-# Initialize the LLM for use with router / structured output
-llm = init_chat_model("openai:gpt-4.1", temperature=0.0)
-llm_router = llm.with_structured_output(RouterSchema) 
+# The LLMs are created on first use rather than at import time
+@cache
+def get_llm():
+    """Get the chat model shared by the router and the agent"""
+    # The system prompts are static prefixes, so a fixed cache key helps OpenAI reuse cached prompt tokens
+    return init_chat_model(
+        "openai:gpt-4.1",
+        temperature=0.0,
+        extra_body={"prompt_cache_key": "email_assistant_hitl_memory_gmail"},
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client(),
+    )
+
+@cache
+def get_llm_router():
+    """Get the LLM for use with router / structured output"""
+    return get_llm().with_structured_output(RouterSchema)
 
-# Initialize the LLM, enforcing tool use (of any available tools) for agent
-llm = init_chat_model("openai:gpt-4.1", temperature=0.0)
-llm_with_tools = llm.bind_tools(tools, tool_choice="required")
+@cache
+def get_llm_with_tools():
+    """Get the LLM, enforcing tool use (of any available tools) for agent"""
+    return get_llm().bind_tools(tools, tool_choice="required")
+
+@cache
+def get_llm_memory_updater():
+    """Get the LLM for use with memory updates / structured output"""
+    return get_llm().with_structured_output(UserPreferences)
+
+def get_memories(store, defaults):
+    """Get several memory profiles from the store, initializing any that don't exist with their defaults.
+    
+    Waits for any queued updates of these profiles first. Recently read profiles are served from
+    memory_cache, and the rest are read in a single store call.
+    
+    Args:
+        store: LangGraph BaseStore instance to search for existing memory
+        defaults: Dict mapping each namespace tuple to the default content for that namespace
+        
+    Returns:
+        list[str]: The content of each memory profile, in the same order as defaults
+    """
+    # Let queued updates of these profiles land first, so they are never read stale
+    wait_for_memory_updates(store, defaults)
+    
+    now = time.monotonic()
+    store_cache = memory_cache.setdefault(store, {})
+    
+    # Find the profiles that aren't cached or have expired
+    uncached = [namespace for namespace in defaults if namespace not in store_cache or store_cache[namespace][0] <= now]
+    
+    if uncached:
+        # Search for existing memories with namespace and key
+        items = store.batch([GetOp(namespace, "user_preferences") for namespace in uncached])
+        
+        # Defaults for the memories that don't exist yet, written together below
+        puts = []
+        for namespace, user_preferences in zip(uncached, items):
+            # If memory exists, use its content (the value)
+            if user_preferences:
+                user_preferences = user_preferences.value
+            
+            # If memory doesn't exist, add it to the store and use the default content
+            else:
+                # Namespace, key, value
+                puts.append(PutOp(namespace, "user_preferences", defaults[namespace]))
+                user_preferences = defaults[namespace]
+            
+            store_cache[namespace] = (now + MEMORY_CACHE_TTL_SECONDS, user_preferences)
+        
+        if puts:
+            store.batch(puts)
+    
+    return [store_cache[namespace][1] for namespace in defaults]
 
 def get_memory(store, namespace, default_content=None):
     """Get memory from the store or initialize with default if it doesn't exist.
@@ -39,21 +114,7 @@ def get_memory(store, namespace, default_content=None):
     Returns:
         str: The content of the memory profile, either from existing memory or the default
     """
-    # Search for existing memory with namespace and key
-    user_preferences = store.get(namespace, "user_preferences")
-    
-    # If memory exists, return its content (the value)
-    if user_preferences:
-        return user_preferences.value
-    
-    # If memory doesn't exist, add it to the store and return the default content
-    else:
-        # Namespace, key, value
-        store.put(namespace, "user_preferences", default_content)
-        user_preferences = default_content
-    
-    # Return the default content
-    return user_preferences 
+    return get_memories(store, {namespace: default_content})[0]
 
 def update_memory(store, namespace, messages):
     """Update memory profile in the store.
@@ -66,15 +127,53 @@ def update_memory(store, namespace, messages):
 
     # Get the existing memory
     user_preferences = store.get(namespace, "user_preferences")
+    # Skip the LLM call if this exact update was already applied to this exact profile
+    update_key = hashlib.sha256(repr((user_preferences.value, messages)).encode()).hexdigest()
+    applied_updates = memory_update_keys.setdefault(store, {})
+    if applied_updates.get(namespace) == update_key:
+        return
     # Update the memory
-    llm = init_chat_model("openai:gpt-4.1", temperature=0.0).with_structured_output(UserPreferences)
-    result = llm.invoke(
+    result = get_llm_memory_updater().invoke(
         [
             {"role": "system", "content": MEMORY_UPDATE_INSTRUCTIONS.format(current_profile=user_preferences.value, namespace=namespace)},
         ] + messages
     )
     # Save the updated memory to the store
     store.put(namespace, "user_preferences", result.user_preferences)
+    # Keep the cache in step with the store
+    memory_cache.setdefault(store, {})[namespace] = (time.monotonic() + MEMORY_CACHE_TTL_SECONDS, result.user_preferences)
+    applied_updates[namespace] = update_key
+
+def queue_memory_update(store, namespace, messages):
+    """Queue a memory profile update to run in the background, returning its future"""
+    return submit_memory_update(update_memory, store, namespace, messages)
+
+# The prompts only change when the memory profiles do, so recent renders are reused
+@lru_cache(maxsize=128)
+def render_triage_system_prompt(triage_instructions):
+    """Format the triage system prompt with background and triage instructions"""
+    return triage_system_prompt.format(
+        background=default_background,
+        triage_instructions=triage_instructions,
+    )
+
+@lru_cache(maxsize=128)
+def render_agent_system_prompt(response_preferences, cal_preferences):
+    """Format the agent system prompt with the tools, background and preferences"""
+    return agent_system_prompt_hitl_memory.format(
+        tools_prompt=GMAIL_TOOLS_PROMPT,
+        background=default_background,
+        response_preferences=response_preferences, 
+        cal_preferences=cal_preferences
+    )
+
+def get_email_markdown(state: State) -> str:
+    """Get the email markdown stored by triage_router, formatting it from email_input if it's missing"""
+    # Threads started before triage_router stored the markdown don't have it in their state
+    if "email_markdown" in state:
+        return state["email_markdown"]
+    author, to, subject, email_thread, email_id = parse_gmail(state["email_input"])
+    return format_gmail_markdown(subject, author, to, email_thread, email_id)
 
 # Nodes 
 def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_interrupt_handler", "response_agent", "__end__"]]:
@@ -92,20 +191,19 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
         author=author, to=to, subject=subject, email_thread=email_thread
     )
 
-    # Create email markdown for Agent Inbox in case of notification  
-    email_markdown = format_gmail_markdown(subject, author, to, email_thread, email_id)
-
     # Search for existing triage_preferences memory
-    triage_instructions = get_memory(store, ("email_assistant", "triage_preferences"), default_triage_instructions)
+    # The response and calendar preferences are read in the same store call, so llm_call finds them in memory_cache
+    triage_instructions, _, _ = get_memories(store, {
+        ("email_assistant", "triage_preferences"): default_triage_instructions,
+        ("email_assistant", "response_preferences"): default_response_preferences,
+        ("email_assistant", "cal_preferences"): default_cal_preferences,
+    })
 
     # Format system prompt with background and triage instructions
-    system_prompt = triage_system_prompt.format(
-        background=default_background,
-        triage_instructions=triage_instructions,
-    )
+    system_prompt = render_triage_system_prompt(triage_instructions)
 
     # Run the router LLM
-    result = llm_router.invoke(
+    result = get_llm_router().invoke(
         [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
@@ -117,19 +215,22 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
 
     # Process the classification decision
     if classification == "respond":
-        print("📧 Classification: RESPOND - This email requires a response")
+        logger.info("📧 Classification: RESPOND - This email requires a response")
         # Next node
         goto = "response_agent"
-        # Update the state
+        # Create email markdown only when the agent needs it to write a response
+        email_markdown = format_gmail_markdown(subject, author, to, email_thread, email_id)
+        # Update the state, keeping the markdown so later nodes don't parse the email again
         update = {
             "classification_decision": result.classification,
+            "email_markdown": email_markdown,
             "messages": [{"role": "user",
                             "content": f"Respond to the email: {email_markdown}"
                         }],
         }
         
     elif classification == "ignore":
-        print("🚫 Classification: IGNORE - This email can be safely ignored")
+        logger.info("🚫 Classification: IGNORE - This email can be safely ignored")
 
         # Next node
         goto = END
@@ -139,13 +240,16 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
         }
 
     elif classification == "notify":
-        print("🔔 Classification: NOTIFY - This email contains important information") 
+        logger.info("🔔 Classification: NOTIFY - This email contains important information")
 
         # Next node
         goto = "triage_interrupt_handler"
+        # Create email markdown for Agent Inbox, keeping it so later nodes don't parse the email again
+        email_markdown = format_gmail_markdown(subject, author, to, email_thread, email_id)
         # Update the state
         update = {
             "classification_decision": classification,
+            "email_markdown": email_markdown,
         }
 
     else:
@@ -156,11 +260,8 @@ def triage_router(state: State, store: BaseStore) -> Command[Literal["triage_int
 def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal["response_agent", "__end__"]]:
     """Handles interrupts from the triage step"""
     
-    # Parse the email input
-    author, to, subject, email_thread, email_id = parse_gmail(state["email_input"])
-
-    # Create email markdown for Agent Inbox in case of notification  
-    email_markdown = format_gmail_markdown(subject, author, to, email_thread, email_id)
+    # Email markdown for Agent Inbox in case of notification
+    email_markdown = get_email_markdown(state)
 
     # Create messages
     messages = [{"role": "user",
@@ -194,7 +295,7 @@ def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal[
                         "content": f"User wants to reply to the email. Use this feedback to respond: {user_input}"
                         })
         # Update memory with feedback
-        update_memory(store, ("email_assistant", "triage_preferences"), [{
+        queue_memory_update(store, ("email_assistant", "triage_preferences"), [{
             "role": "user",
             "content": f"The user decided to respond to the email, so update the triage preferences to capture this."
         }] + messages)
@@ -208,7 +309,7 @@ def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal[
                         "content": f"The user decided to ignore the email even though it was classified as notify. Update triage preferences to capture this."
                         })
         # Update memory with feedback 
-        update_memory(store, ("email_assistant", "triage_preferences"), messages)
+        queue_memory_update(store, ("email_assistant", "triage_preferences"), messages)
         goto = END
 
     # Catch all other responses
@@ -225,28 +326,58 @@ def triage_interrupt_handler(state: State, store: BaseStore) -> Command[Literal[
 def llm_call(state: State, store: BaseStore):
     """LLM decides whether to call a tool or not"""
     
-    # Search for existing cal_preferences memory
-    cal_preferences = get_memory(store, ("email_assistant", "cal_preferences"), default_cal_preferences)
-    
-    # Search for existing response_preferences memory
-    response_preferences = get_memory(store, ("email_assistant", "response_preferences"), default_response_preferences)
+    # Search for existing cal_preferences and response_preferences memories together
+    cal_preferences, response_preferences = get_memories(store, {
+        ("email_assistant", "cal_preferences"): default_cal_preferences,
+        ("email_assistant", "response_preferences"): default_response_preferences,
+    })
 
     return {
         "messages": [
-            llm_with_tools.invoke(
+            get_llm_with_tools().invoke(
                 [
-                    {"role": "system", "content": agent_system_prompt_hitl_memory.format(
-                        tools_prompt=GMAIL_TOOLS_PROMPT,
-                        background=default_background,
-                        response_preferences=response_preferences, 
-                        cal_preferences=cal_preferences
-                    )}
+                    {"role": "system", "content": render_agent_system_prompt(response_preferences, cal_preferences)}
                 ]
                 + state["messages"]
             )
         ]
     }
     
+# Actions allowed in Agent Inbox for each tool that needs review
+HITL_CONFIGS = {
+    "send_email_tool": {
+        "allow_ignore": True,
+        "allow_respond": True,
+        "allow_edit": True,
+        "allow_accept": True,
+    },
+    "schedule_meeting_tool": {
+        "allow_ignore": True,
+        "allow_respond": True,
+        "allow_edit": True,
+        "allow_accept": True,
+    },
+    "Question": {
+        "allow_ignore": True,
+        "allow_respond": True,
+        "allow_edit": False,
+        "allow_accept": False,
+    },
+}
+
+# Allowed tools for HITL
+HITL_TOOLS = frozenset(HITL_CONFIGS)
+
+def run_tools(tool_calls):
+    """Run tool calls concurrently and return their observations keyed by tool call ID"""
+    if len(tool_calls) <= 1:
+        return {tool_call["id"]: tools_by_name[tool_call["name"]].invoke(tool_call["args"]) for tool_call in tool_calls}
+
+    # The context-aware executor keeps tracing callbacks attached to this run
+    with ContextThreadPoolExecutor(max_workers=len(tool_calls)) as executor:
+        results = executor.map(lambda tool_call: tools_by_name[tool_call["name"]].invoke(tool_call["args"]), tool_calls)
+        return {tool_call["id"]: observation for tool_call, observation in zip(tool_calls, results)}
+
 def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_call", "__end__"]]:
     """Creates an interrupt for human review of tool calls"""
     
@@ -256,54 +387,27 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
     # Go to the LLM call node next
     goto = "llm_call"
 
+    # Get original email, which is shown with every tool call sent to Agent Inbox
+    original_email_markdown = get_email_markdown(state)
+
+    # Execute search_memory and other tools that don't need review up front, running them concurrently
+    tool_calls = state["messages"][-1].tool_calls
+    observations = run_tools([tool_call for tool_call in tool_calls if tool_call["name"] not in HITL_TOOLS])
+
     # Iterate over the tool calls in the last message
-    for tool_call in state["messages"][-1].tool_calls:
-        
-        # Allowed tools for HITL
-        hitl_tools = ["send_email_tool", "schedule_meeting_tool", "Question"]
+    for tool_call in tool_calls:
         
-        # If tool is not in our HITL list, execute it directly without interruption
-        if tool_call["name"] not in hitl_tools:
-
-            # Execute search_memory and other tools without interruption
-            tool = tools_by_name[tool_call["name"]]
-            observation = tool.invoke(tool_call["args"])
-            result.append({"role": "tool", "content": observation, "tool_call_id": tool_call["id"]})
+        # If tool is not in our HITL list, use its result directly without interruption
+        if tool_call["name"] not in HITL_TOOLS:
+            result.append({"role": "tool", "content": observations[tool_call["id"]], "tool_call_id": tool_call["id"]})
             continue
             
-        # Get original email from email_input in state
-        email_input = state["email_input"]
-        author, to, subject, email_thread, email_id = parse_gmail(email_input)
-        original_email_markdown = format_gmail_markdown(subject, author, to, email_thread, email_id)
-        
         # Format tool call for display and prepend the original email
         tool_display = format_for_display(tool_call)
         description = original_email_markdown + tool_display
 
         # Configure what actions are allowed in Agent Inbox
-        if tool_call["name"] == "send_email_tool":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": True,
-                "allow_accept": True,
-            }
-        elif tool_call["name"] == "schedule_meeting_tool":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": True,
-                "allow_accept": True,
-            }
-        elif tool_call["name"] == "Question":
-            config = {
-                "allow_ignore": True,
-                "allow_respond": True,
-                "allow_edit": False,
-                "allow_accept": False,
-            }
-        else:
-            raise ValueError(f"Invalid tool call: {tool_call['name']}")
+        config = HITL_CONFIGS[tool_call["name"]]
 
         # Create the interrupt request
         request = {
@@ -339,10 +443,11 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
             ai_message = state["messages"][-1] # Get the most recent message from the state
             current_id = tool_call["id"] # Store the ID of the tool call being edited
             
-            # Create a new list of tool calls by filtering out the one being edited and adding the updated version
-            # This avoids modifying the original list directly (immutable approach)
-            updated_tool_calls = [tc for tc in ai_message.tool_calls if tc["id"] != current_id] + [
-                {"type": "tool_call", "name": tool_call["name"], "args": edited_args, "id": current_id}
+            # Create a new list of tool calls in one pass, swapping in the updated version of the one being edited
+            # This avoids modifying the original list directly (immutable approach) and keeps the tool calls in order
+            updated_tool_calls = [
+                {"type": "tool_call", "name": tool_call["name"], "args": edited_args, "id": current_id} if tc["id"] == current_id else tc
+                for tc in ai_message.tool_calls
             ]
 
             # Create a new copy of the message with updated tool calls rather than modifying the original
@@ -359,7 +464,7 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
                 result.append({"role": "tool", "content": observation, "tool_call_id": current_id})
 
                 # This is new: update the memory
-                update_memory(store, ("email_assistant", "response_preferences"), [{
+                queue_memory_update(store, ("email_assistant", "response_preferences"), [{
                     "role": "user",
                     "content": f"User edited the email response. Here is the initial email generated by the assistant: {initial_tool_call}. Here is the edited email: {edited_args}. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
                 }])
@@ -374,7 +479,7 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
                 result.append({"role": "tool", "content": observation, "tool_call_id": current_id})
 
                 # This is new: update the memory
-                update_memory(store, ("email_assistant", "cal_preferences"), [{
+                queue_memory_update(store, ("email_assistant", "cal_preferences"), [{
                     "role": "user",
                     "content": f"User edited the calendar invitation. Here is the initial calendar invitation generated by the assistant: {initial_tool_call}. Here is the edited calendar invitation: {edited_args}. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
                 }])
@@ -391,7 +496,7 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
                 # Go to END
                 goto = END
                 # This is new: update the memory
-                update_memory(store, ("email_assistant", "triage_preferences"), state["messages"] + result + [{
+                queue_memory_update(store, ("email_assistant", "triage_preferences"), state["messages"] + result + [{
                     "role": "user",
                     "content": f"The user ignored the email draft. That means they did not want to respond to the email. Update the triage preferences to ensure emails of this type are not classified as respond. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
                 }])
@@ -402,7 +507,7 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
                 # Go to END
                 goto = END
                 # This is new: update the memory
-                update_memory(store, ("email_assistant", "triage_preferences"), state["messages"] + result + [{
+                queue_memory_update(store, ("email_assistant", "triage_preferences"), state["messages"] + result + [{
                     "role": "user",
                     "content": f"The user ignored the calendar meeting draft. That means they did not want to schedule a meeting for this email. Update the triage preferences to ensure emails of this type are not classified as respond. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
                 }])
@@ -413,7 +518,7 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
                 # Go to END
                 goto = END
                 # This is new: update the memory
-                update_memory(store, ("email_assistant", "triage_preferences"), state["messages"] + result + [{
+                queue_memory_update(store, ("email_assistant", "triage_preferences"), state["messages"] + result + [{
                     "role": "user",
                     "content": f"The user ignored the Question. That means they did not want to answer the question or deal with this email. Update the triage preferences to ensure emails of this type are not classified as respond. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
                 }])
@@ -427,20 +532,22 @@ def interrupt_handler(state: State, store: BaseStore) -> Command[Literal["llm_ca
             if tool_call["name"] == "send_email_tool":
                 # Don't execute the tool, and add a message with the user feedback to incorporate into the email
                 result.append({"role": "tool", "content": f"User gave feedback, which can we incorporate into the email. Feedback: {user_feedback}", "tool_call_id": tool_call["id"]})
-                # This is new: update the memory
-                update_memory(store, ("email_assistant", "response_preferences"), state["messages"] + result + [{
-                    "role": "user",
-                    "content": f"User gave feedback, which we can use to update the response preferences. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
-                }])
+                # This is new: update the memory, unless the feedback is blank and there's nothing to learn from
+                if str(user_feedback).strip():
+                    queue_memory_update(store, ("email_assistant", "response_preferences"), state["messages"] + result + [{
+                        "role": "user",
+                        "content": f"User gave feedback, which we can use to update the response preferences. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
+                    }])
 
             elif tool_call["name"] == "schedule_meeting_tool":
                 # Don't execute the tool, and add a message with the user feedback to incorporate into the email
                 result.append({"role": "tool", "content": f"User gave feedback, which can we incorporate into the meeting request. Feedback: {user_feedback}", "tool_call_id": tool_call["id"]})
-                # This is new: update the memory
-                update_memory(store, ("email_assistant", "cal_preferences"), state["messages"] + result + [{
-                    "role": "user",
-                    "content": f"User gave feedback, which we can use to update the calendar preferences. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
-                }])
+                # This is new: update the memory, unless the feedback is blank and there's nothing to learn from
+                if str(user_feedback).strip():
+                    queue_memory_update(store, ("email_assistant", "cal_preferences"), state["messages"] + result + [{
+                        "role": "user",
+                        "content": f"User gave feedback, which we can use to update the calendar preferences. Follow all instructions above, and remember: {MEMORY_UPDATE_INSTRUCTIONS_REINFORCEMENT}."
+                    }])
 
             elif tool_call["name"] == "Question":
                 # Don't execute the tool, and add a message with the user feedback to incorporate into the email
@@ -462,17 +569,17 @@ def should_continue(state: State, store: BaseStore) -> Literal["interrupt_handle
     messages = state["messages"]
     last_message = messages[-1]
     if last_message.tool_calls:
-        for tool_call in last_message.tool_calls: 
-            if tool_call["name"] == "Done":
-                # TODO: Here, we could update the background memory with the email-response for follow up actions. 
-                return "mark_as_read_node"
-            else:
-                return "interrupt_handler"
+        # End only when Done is the only call in the turn; any other call (e.g. a reply) still has to be
+        # reviewed and run first, and the agent calls Done again once it has
+        if all(tool_call["name"] == "Done" for tool_call in last_message.tool_calls):
+            # TODO: Here, we could update the background memory with the email-response for follow up actions. 
+            return "mark_as_read_node"
+        return "interrupt_handler"
+    return "mark_as_read_node"
 
 def mark_as_read_node(state: State):
-    email_input = state["email_input"]
-    author, to, subject, email_thread, email_id = parse_gmail(email_input)
-    mark_as_read(email_id)
+    # Only the Gmail message ID is needed, so skip parsing the rest of the email
+    mark_as_read(state["email_input"]["id"])
 
 # Build workflow
 agent_builder = StateGraph(State)
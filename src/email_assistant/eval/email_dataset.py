@@ -383,73 +383,6 @@ response_criteria_16 = """
 • Ensure the user is notified  
 """
 
-examples_triage = [
-  {
-      "inputs": {"email_input": email_input_1},
-      "outputs": {"classification": triage_output_1},
-  },
-  {
-      "inputs": {"email_input": email_input_2},
-      "outputs": {"classification": triage_output_2},
-  },
-  {
-      "inputs": {"email_input": email_input_3},
-      "outputs": {"classification": triage_output_3},
-  },
-  {
-      "inputs": {"email_input": email_input_4},
-      "outputs": {"classification": triage_output_4},
-  },
-  {
-      "inputs": {"email_input": email_input_5},
-      "outputs": {"classification": triage_output_5},
-  },
-  {
-      "inputs": {"email_input": email_input_6},
-      "outputs": {"classification": triage_output_6},
-  },
-  {
-      "inputs": {"email_input": email_input_7},
-      "outputs": {"classification": triage_output_7},
-  },
-  {
-      "inputs": {"email_input": email_input_8},
-      "outputs": {"classification": triage_output_8},
-  },
-  {
-      "inputs": {"email_input": email_input_9},
-      "outputs": {"classification": triage_output_9},
-  },
-  {
-      "inputs": {"email_input": email_input_10},
-      "outputs": {"classification": triage_output_10},
-  },
-  {
-      "inputs": {"email_input": email_input_11},
-      "outputs": {"classification": triage_output_11},
-  },
-  {
-      "inputs": {"email_input": email_input_12},
-      "outputs": {"classification": triage_output_12},
-  },
-  {
-      "inputs": {"email_input": email_input_13},
-      "outputs": {"classification": triage_output_13},
-  },
-  {
-      "inputs": {"email_input": email_input_14},
-      "outputs": {"classification": triage_output_14},
-  },
-  {
-      "inputs": {"email_input": email_input_15},
-      "outputs": {"classification": triage_output_15},
-  },
-  {
-      "inputs": {"email_input": email_input_16},
-      "outputs": {"classification": triage_output_16},
-  },
-]
-
 email_inputs = [
         email_input_1, email_input_2, email_input_3, email_input_4, email_input_5,
         email_input_6, email_input_7, email_input_8, email_input_9, email_input_10,
@@ -478,6 +411,15 @@ triage_outputs_list = [
     triage_output_16
 ]
 
+# LangSmith examples pairing each email with its ground truth classification
+examples_triage = [
+    {
+        "inputs": {"email_input": email_input},
+        "outputs": {"classification": triage_output},
+    }
+    for email_input, triage_output in zip(email_inputs, triage_outputs_list)
+]
+
 # Define expected tool calls for each email response based on content analysis
 # Options: write_email, schedule_meeting, check_calendar_availability, done
 expected_tool_calls = [
@@ -0,0 +1,48 @@
+"""Shared HTTP clients for the OpenAI chat models."""
+
+import asyncio
+import weakref
+from functools import cache
+
+import httpx
+
+# Keep connections to the OpenAI API open between calls, so each email doesn't pay for a new TLS handshake
+LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300)
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """Async transport that keeps a separate connection pool for each event loop.
+
+    Pooled connections belong to the loop that opened them and break once it closes,
+    as it does after every asyncio.run in notebooks, evals and tests.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        # Pools are dropped along with their loop
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _get_transport(self):
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._kwargs)
+        return transport
+
+    async def handle_async_request(self, request):
+        return await self._get_transport().handle_async_request(request)
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+@cache
+def get_http_client() -> httpx.Client:
+    """Get the HTTP/2 client shared by all synchronous chat model calls"""
+    return httpx.Client(http2=True, limits=LIMITS)
+
+@cache
+def get_http_async_client() -> httpx.AsyncClient:
+    """Get the HTTP/2 client shared by all asynchronous chat model calls, pooling connections per event loop"""
+    # The chat models keep this client for their lifetime, so it can't be swapped per loop; its transport is
+    return httpx.AsyncClient(transport=LoopLocalTransport(http2=True, limits=LIMITS))
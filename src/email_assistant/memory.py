@@ -0,0 +1,71 @@
+"""Memory profile caches and background updates shared by every graph that keeps user preferences in the store."""
+
+import logging
+import threading
+import weakref
+from concurrent.futures import wait
+
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Memory profiles read from each store, as {namespace: (expiry time, content)}
+# llm_call reads the same profiles on every agent step, so reads are cached for a short time.
+# The graphs served together read and update the same namespaces, so they share this one cache, and
+# update_memory writes each new profile into it; the expiry bounds how stale a profile can be when it
+# is changed outside this process (e.g. from LangGraph Studio or another server worker)
+MEMORY_CACHE_TTL_SECONDS = 60
+memory_cache = weakref.WeakKeyDictionary()
+
+# Hash of the last update applied to each profile in each store, as {namespace: hash}
+memory_update_keys = weakref.WeakKeyDictionary()
+
+# Memory updates run in the background so the interrupt handlers don't wait on the extra LLM call;
+# a single worker shared by all graphs applies them in the order they were queued, so updates to a
+# profile never race. The context-aware executor keeps each update traced under the run that queued it
+memory_executor = ContextThreadPoolExecutor(max_workers=1, thread_name_prefix="update_memory")
+
+# Latest queued update of each profile in each store, as {namespace: future}
+pending_memory_updates = weakref.WeakKeyDictionary()
+pending_memory_updates_lock = threading.Lock()
+
+def log_memory_update_error(future):
+    """Log a memory update that failed in the background"""
+    if future.exception() is not None:
+        logger.error("Memory update failed", exc_info=future.exception())
+
+def submit_memory_update(update_memory, store, namespace, messages):
+    """Queue a memory profile update to run in the background.
+    
+    Args:
+        update_memory: Function applying the update, called as update_memory(store, namespace, messages)
+        store: LangGraph BaseStore instance to update memory
+        namespace: Tuple defining the memory namespace, e.g. ("email_assistant", "triage_preferences")
+        messages: List of messages to update the memory with
+        
+    Returns:
+        Future: Completes once the update has been saved to the store
+    """
+    # Copy the messages so later changes to the caller's list don't leak into the update
+    with pending_memory_updates_lock:
+        future = memory_executor.submit(update_memory, store, namespace, list(messages))
+        pending_memory_updates.setdefault(store, {})[namespace] = future
+    future.add_done_callback(log_memory_update_error)
+    return future
+
+def wait_for_memory_updates(store, namespaces):
+    """Block until the queued updates of the given profiles have been saved to the store.
+    
+    Updates run in the order they were queued, so waiting for the latest update of a
+    profile also waits for every earlier one.
+    
+    Args:
+        store: LangGraph BaseStore instance the profiles are kept in
+        namespaces: Namespace tuples of the profiles about to be read
+    """
+    with pending_memory_updates_lock:
+        pending = pending_memory_updates.get(store, {})
+        futures = [pending[namespace] for namespace in namespaces if namespace in pending]
+    if futures:
+        # A failed update is already logged, and the profile stays as it was
+        wait(futures)
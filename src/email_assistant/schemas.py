@@ -22,6 +22,8 @@ class State(MessagesState):
     # This state class has the messages key build in
     email_input: dict
     classification_decision: Literal["ignore", "respond", "notify"]
+    # Formatted email, set by triage_router so later nodes don't parse email_input again
+    email_markdown: str
 
 class EmailData(TypedDict):
     id: str
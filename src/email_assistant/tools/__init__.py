@@ -1,6 +1,16 @@
-from email_assistant.tools.base import get_tools, get_tools_by_name
-from email_assistant.tools.default.email_tools import write_email, triage_email, Done
-from email_assistant.tools.default.calendar_tools import schedule_meeting, check_calendar_availability
+import importlib
+
+# The tools are imported on first access, so scripts that only need a submodule
+# (e.g. tools.gmail.run_ingest) don't pay for loading LangChain and the tool definitions
+_LAZY_ATTRIBUTES = {
+    "get_tools": "email_assistant.tools.base",
+    "get_tools_by_name": "email_assistant.tools.base",
+    "write_email": "email_assistant.tools.default.email_tools",
+    "triage_email": "email_assistant.tools.default.email_tools",
+    "Done": "email_assistant.tools.default.email_tools",
+    "schedule_meeting": "email_assistant.tools.default.calendar_tools",
+    "check_calendar_availability": "email_assistant.tools.default.calendar_tools",
+}
 
 __all__ = [
     "get_tools",
@@ -10,4 +20,12 @@ __all__ = [
     "Done",
     "schedule_meeting",
     "check_calendar_availability",
-]
\ No newline at end of file
+]
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        # Cache it on the package so later lookups skip __getattr__
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
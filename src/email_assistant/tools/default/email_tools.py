@@ -8,10 +8,13 @@ def write_email(to: str, subject: str, content: str) -> str:
     # Placeholder response - in real app would send email
     return f"Email sent to {to} with subject '{subject}' and content: {content}"
 
+# The tool result for each category, built once since there are only three
+TRIAGE_DECISIONS = {category: f"Classification Decision: {category}" for category in ("ignore", "notify", "respond")}
+
 @tool
 def triage_email(category: Literal["ignore", "notify", "respond"]) -> str:
     """Triage an email into one of three categories: ignore, notify, respond."""
-    return f"Classification Decision: {category}"
+    return TRIAGE_DECISIONS[category]
 
 @tool
 class Done(BaseModel):
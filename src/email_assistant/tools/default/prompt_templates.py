@@ -1,37 +1,28 @@
 """Tool prompt templates for the email assistant."""
 
+# Description of each tool, shared by every prompt below so they stay byte-identical
+TOOL_DESCRIPTIONS = {
+    "triage_email": "triage_email(ignore, notify, respond) - Triage emails into one of three categories",
+    "write_email": "write_email(to, subject, content) - Send emails to specified recipients",
+    "schedule_meeting": "schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object",
+    "check_calendar_availability": "check_calendar_availability(day) - Check available time slots for a given day",
+    "Question": "Question(content) - Ask the user any follow-up questions",
+    "Done": "Done - E-mail has been sent",
+}
+
+def format_tools_prompt(tool_names):
+    """Format a numbered list of tool descriptions for insertion into prompts"""
+    return "\n" + "".join(f"{i}. {TOOL_DESCRIPTIONS[name]}\n" for i, name in enumerate(tool_names, start=1))
+
 # Standard tool descriptions for insertion into prompts
-STANDARD_TOOLS_PROMPT = """
-1. triage_email(ignore, notify, respond) - Triage emails into one of three categories
-2. write_email(to, subject, content) - Send emails to specified recipients
-3. schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object
-4. check_calendar_availability(day) - Check available time slots for a given day
-5. Done - E-mail has been sent
-"""
+STANDARD_TOOLS_PROMPT = format_tools_prompt(["triage_email", "write_email", "schedule_meeting", "check_calendar_availability", "Done"])
 
 # Tool descriptions for HITL workflow
-HITL_TOOLS_PROMPT = """
-1. write_email(to, subject, content) - Send emails to specified recipients
-2. schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object
-3. check_calendar_availability(day) - Check available time slots for a given day
-4. Question(content) - Ask the user any follow-up questions
-5. Done - E-mail has been sent
-"""
+HITL_TOOLS_PROMPT = format_tools_prompt(["write_email", "schedule_meeting", "check_calendar_availability", "Question", "Done"])
 
 # Tool descriptions for HITL with memory workflow
 # Note: Additional memory specific tools could be added here 
-HITL_MEMORY_TOOLS_PROMPT = """
-1. write_email(to, subject, content) - Send emails to specified recipients
-2. schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object
-3. check_calendar_availability(day) - Check available time slots for a given day
-4. Question(content) - Ask the user any follow-up questions
-5. Done - E-mail has been sent
-"""
+HITL_MEMORY_TOOLS_PROMPT = format_tools_prompt(["write_email", "schedule_meeting", "check_calendar_availability", "Question", "Done"])
 
 # Tool descriptions for agent workflow without triage
-AGENT_TOOLS_PROMPT = """
-1. write_email(to, subject, content) - Send emails to specified recipients
-2. schedule_meeting(attendees, subject, duration_minutes, preferred_day, start_time) - Schedule calendar meetings where preferred_day is a datetime object
-3. check_calendar_availability(day) - Check available time slots for a given day
-4. Done - E-mail has been sent
-"""
\ No newline at end of file
+AGENT_TOOLS_PROMPT = format_tools_prompt(["write_email", "schedule_meeting", "check_calendar_availability", "Done"])
@@ -1,13 +1,16 @@
 """Gmail tools for email assistant."""
 
-from email_assistant.tools.gmail.gmail_tools import (
-    fetch_emails_tool,
-    send_email_tool,
-    check_calendar_tool,
-    schedule_meeting_tool
-)
+import importlib
 
-from email_assistant.tools.gmail.prompt_templates import GMAIL_TOOLS_PROMPT
+# The tools are imported on first access, so scripts that only need a submodule
+# (e.g. run_ingest) don't pay for loading LangChain and the Gmail tool definitions
+_LAZY_ATTRIBUTES = {
+    "fetch_emails_tool": "email_assistant.tools.gmail.gmail_tools",
+    "send_email_tool": "email_assistant.tools.gmail.gmail_tools",
+    "check_calendar_tool": "email_assistant.tools.gmail.gmail_tools",
+    "schedule_meeting_tool": "email_assistant.tools.gmail.gmail_tools",
+    "GMAIL_TOOLS_PROMPT": "email_assistant.tools.gmail.prompt_templates",
+}
 
 __all__ = [
     "fetch_emails_tool",
@@ -15,4 +18,12 @@ __all__ = [
     "check_calendar_tool",
     "schedule_meeting_tool",
     "GMAIL_TOOLS_PROMPT"
-]
\ No newline at end of file
+]
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        # Cache it on the package so later lookups skip __getattr__
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,28 +5,71 @@ This module formats the Gmail API functions into LangChain tools.
 
 import os
 import sys
-import base64
+# pybase64 uses SIMD kernels for large message bodies; the standard library is a drop-in fallback
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
 import email.utils
 import json
 import logging
+import operator
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional, Dict, Any, Iterator
 from pathlib import Path
 from pydantic import Field, BaseModel
 from langchain_core.tools import tool
 
-# Setup basic logging
-logging.basicConfig(level=logging.INFO)
+# Setup basic logging, unless the application has already configured it
+# Set LOGLEVEL (e.g. DEBUG) to change the level
+if not logging.getLogger().handlers:
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 # Define paths for credentials and tokens
 _ROOT = Path(__file__).parent.absolute()
 _SECRETS_DIR = _ROOT / ".secrets"
 
+# Gmail accepts up to 100 calls in a single batch HTTP request, but recommends at most 50,
+# since larger batches are more likely to be rate limited
+GMAIL_BATCH_SIZE = 50
+
+# Number of Gmail API calls run at once when the batch endpoint can't be used
+GMAIL_MAX_WORKERS = 16
+
+# Seconds a messages.list page is reused for identical searches, so closely spaced polls skip the call
+GMAIL_LIST_CACHE_TTL = 30
+
+# Partial-response masks, so the APIs only return the fields we read
+# Keep these in step with the code that reads the responses
+MESSAGE_LIST_FIELDS = "messages(id,threadId),nextPageToken"
+MESSAGE_FIELDS = "id,threadId,payload(headers,body/data,parts)"
+THREAD_FIELDS = "messages(id,threadId,internalDate,payload(headers,body/data,parts))"
+# Used when only the ordering and sender of a thread's messages are needed
+THREAD_METADATA_FIELDS = "messages(id,internalDate,payload/headers)"
+EVENT_LIST_FIELDS = "items(start,end,summary)"
+
+# Parse Calendar API timestamps, which may end in "Z" for UTC
+# datetime.fromisoformat accepts the "Z" from Python 3.11, so only older versions need to rewrite it
+if sys.version_info >= (3, 11):
+    _from_iso = datetime.fromisoformat
+else:
+    def _from_iso(timestamp):
+        if timestamp.endswith("Z"):
+            timestamp = timestamp[:-1] + "+00:00"
+        return datetime.fromisoformat(timestamp)
+
+def _format_time(dt):
+    """Format a time like strftime("%I:%M %p") (e.g. "09:30 AM") without parsing a format string."""
+    return f"{dt.hour % 12 or 12:02d}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
+
 # We need to try importing the Gmail API libraries
 # If they're not available, we'll use a mock implementation
 try:
-    import logging
     from googleapiclient.discovery import build
     from email.mime.text import MIMEText
     from datetime import timedelta
@@ -34,31 +77,65 @@ try:
     from google.oauth2.credentials import Credentials
     from google_auth_oauthlib.flow import InstalledAppFlow
     from google.auth.transport.requests import Request
-    
-    # Setup logging
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
+    from email_assistant.tools.gmail.json_model import RESPONSE_MODEL
     
     # Email content extraction function
     def extract_message_part(payload):
         """Extract content from a message part."""
-        if payload.get("body", {}).get("data"):
-            # Handle base64 encoded content
-            data = payload["body"]["data"]
-            decoded = base64.urlsafe_b64decode(data).decode("utf-8")
-            return decoded
-            
-        # Handle multipart messages
-        if payload.get("parts"):
-            text_parts = []
-            for part in payload["parts"]:
-                # Recursively process parts
-                content = extract_message_part(part)
-                if content:
-                    text_parts.append(content)
-            return "\n".join(text_parts)
-            
-        return ""
+        # Decode every part into one buffer and convert to text once at the end,
+        # rather than decoding each part to a string and joining the copies
+        # The MIME tree is walked depth-first with an explicit stack instead of recursion
+        out = bytearray()
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            data = part.get("body", {}).get("data")
+            if data:
+                # Handle base64 encoded content, newline-separated from earlier parts
+                decoded = base64.urlsafe_b64decode(data)
+                if decoded:
+                    if out:
+                        out += b"\n"
+                    out += decoded
+            elif part.get("parts"):
+                # Handle multipart messages, pushed in reverse so they are visited in order
+                stack.extend(reversed(part["parts"]))
+        return out.decode("utf-8", errors="replace")
+    
+    # The only headers we read from a message
+    HEADERS_OF_INTEREST = frozenset(("Subject", "From", "To", "Reply-To", "Date"))
+    
+    def _headers_to_dict(headers):
+        """Map the headers we read to their values so each lookup is a dict access instead of a scan."""
+        # Real messages often carry dozens of headers (Received, DKIM, ARC chains...),
+        # so keep only the ones we need and stop as soon as all of them are found
+        # The first occurrence of a repeated header wins, as with next()
+        picked = {}
+        remaining = len(HEADERS_OF_INTEREST)
+        for header in headers:
+            name = header["name"]
+            if name in HEADERS_OF_INTEREST and name not in picked:
+                picked[name] = header["value"]
+                remaining -= 1
+                if not remaining:
+                    break
+        return picked
+    
+    def _sort_thread_messages(messages_in_thread):
+        """Sort a thread's messages in place, oldest first, so the last one is the latest."""
+        # Both thread formats we request include internalDate, so the fallback is rarely taken
+        try:
+            messages_in_thread.sort(key=lambda m: int(m["internalDate"]))
+            logger.debug(f"Sorted {len(messages_in_thread)} messages by internalDate")
+        except KeyError:
+            # Fallback to ID-based sorting if internalDate is missing
+            messages_in_thread.sort(key=operator.itemgetter("id"))
+            logger.debug(f"Sorted {len(messages_in_thread)} messages by ID (internalDate missing)")
+    
+    @lru_cache(maxsize=32)
+    def _query_prefix(email_address):
+        """Gmail search fragment matching mail to or from the address, built once per address."""
+        return f"(to:{email_address} OR from:{email_address})"
     
     # Function to get credentials from token.json or environment variables
     def get_credentials(gmail_token=None, gmail_secret=None):
@@ -78,20 +155,31 @@ try:
             Google OAuth2 Credentials object or None if credentials can't be loaded
         """
         token_path = _SECRETS_DIR / "token.json"
+        
+        # Reuse the credentials from the last call unless a token source has changed, so tool calls
+        # don't re-read the token and the same object keeps its refreshed access token
+        if gmail_token is not None and not isinstance(gmail_token, str):
+            gmail_token = json.dumps(gmail_token, sort_keys=True)
+        token_mtime = token_path.stat().st_mtime_ns if token_path.exists() else None
+        return _load_credentials(gmail_token, gmail_secret, os.getenv("GMAIL_TOKEN"), token_mtime)
+    
+    @lru_cache(maxsize=4)
+    def _load_credentials(gmail_token, gmail_secret, env_token, token_mtime):
+        """Load Gmail credentials; env_token and token_mtime key the cache so changed tokens are reloaded."""
+        token_path = _SECRETS_DIR / "token.json"
         token_data = None
         
         # Try to get token data from various sources
         if gmail_token:
             # 1. Use directly passed token parameter if available
             try:
-                token_data = json.loads(gmail_token) if isinstance(gmail_token, str) else gmail_token
+                token_data = json.loads(gmail_token)
                 logger.info("Using directly provided gmail_token parameter")
             except Exception as e:
                 logger.warning(f"Could not parse provided gmail_token: {str(e)}")
                 
         if token_data is None:
             # 2. Try environment variable
-            env_token = os.getenv("GMAIL_TOKEN")
             if env_token:
                 try:
                     token_data = json.loads(env_token)
@@ -135,6 +223,150 @@ try:
             logger.error(f"Error creating credentials object: {str(e)}")
             return None
     
+    # API services already built, per thread, keyed by API, version and the credentials they use
+    # Each service holds its own httplib2.Http, which isn't thread-safe, and tool calls run on several threads at once
+    _services = threading.local()
+    
+    def get_service(api, version, creds):
+        """
+        Return an API service for the given credentials, building it only on first use in this thread.
+        
+        Reusing the service skips re-reading the discovery document and keeps the
+        authorized HTTP connection open between tool calls on the same thread.
+        
+        Args:
+            api: API name, e.g. "gmail" or "calendar"
+            version: API version, e.g. "v1"
+            creds: Credentials returned by get_credentials
+            
+        Returns:
+            Google API service object
+        """
+        # The access token is left out, since it changes whenever the credentials refresh themselves
+        key = (api, version, creds.client_id, creds.refresh_token or creds.token)
+        services = getattr(_services, "by_key", None)
+        if services is None:
+            services = _services.by_key = {}
+        service = services.get(key)
+        if service is None:
+            service = services[key] = build(api, version, credentials=creds, cache_discovery=False, model=RESPONSE_MODEL)
+        return service
+    
+    # messages.list pages from recent searches, keyed by service, query and page token
+    _list_cache = {}
+    
+    def list_messages_page(service, query, page_token=None):
+        """
+        Return one page of messages matching a Gmail search, reusing recent identical searches.
+        
+        Pages are kept for GMAIL_LIST_CACHE_TTL seconds, and dropped as soon as we
+        send an email or mark one as read, since either can change the results.
+        
+        Args:
+            service: Gmail API service object
+            query: Gmail search query
+            page_token: Token of the page to fetch, or None for the first page
+            
+        Returns:
+            The messages.list response
+        """
+        key = (service, query, page_token)
+        now = time.monotonic()
+        cached = _list_cache.get(key)
+        if cached is not None and now - cached[0] < GMAIL_LIST_CACHE_TTL:
+            return cached[1]
+        
+        results = (
+            service.users()
+            .messages()
+            .list(userId="me", q=query, pageToken=page_token, fields=MESSAGE_LIST_FIELDS)
+            .execute()
+        )
+        
+        # Drop expired pages so old queries don't accumulate
+        # Other threads may sweep at the same time, so iterate over a copy and tolerate keys already gone
+        for stale_key in [k for k, (fetched_at, _) in list(_list_cache.items()) if now - fetched_at >= GMAIL_LIST_CACHE_TTL]:
+            _list_cache.pop(stale_key, None)
+        _list_cache[key] = (now, results)
+        return results
+    
+    def iter_message_pages(service, query):
+        """
+        Yield the messages on each page of a Gmail search, fetching a page only when the previous one is done.
+        
+        Args:
+            service: Gmail API service object
+            query: Gmail search query
+            
+        Yields:
+            List of message dicts with "id" and "threadId", one list per non-empty page
+        """
+        page_token = None
+        while True:
+            results = list_messages_page(service, query, page_token)
+            if "messages" in results:
+                logger.info(f"Found {len(results['messages'])} messages in this page")
+                yield results["messages"]
+            else:
+                logger.info("No messages found in this page")
+                
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                return
+    
+    # Function to run many Gmail API calls in as few HTTP round trips as possible
+    def execute_batch(service, requests, batch_size=None):
+        """
+        Execute Gmail API requests through the batch HTTP endpoint.
+        
+        Args:
+            service: Gmail API service object
+            requests: Dict mapping a unique key to an unexecuted API request
+            batch_size: Maximum number of calls per batch HTTP request (default: GMAIL_BATCH_SIZE)
+            
+        Returns:
+            Dict mapping each key to its response, or to the exception if that call failed
+        """
+        batch_size = batch_size or GMAIL_BATCH_SIZE
+        responses = {}
+        
+        def callback(request_id, response, exception):
+            responses[request_id] = exception if exception is not None else response
+        
+        keys = list(requests)
+        for start in range(0, len(keys), batch_size):
+            batch = service.new_batch_http_request(callback=callback)
+            for key in keys[start:start + batch_size]:
+                batch.add(requests[key], request_id=key)
+            batch.execute()
+        
+        return responses
+    
+    def execute_threaded(creds, make_request, keys, max_workers=None):
+        """
+        Execute Gmail API requests concurrently, as a fallback when the batch endpoint fails.
+        
+        httplib2 connections aren't thread-safe, so each worker thread uses its own service from get_service.
+        
+        Args:
+            creds: Credentials returned by get_credentials
+            make_request: Function taking a Gmail service and a key and returning an unexecuted API request
+            keys: Keys to fetch, one API call each
+            max_workers: Maximum number of calls in flight (default: GMAIL_MAX_WORKERS)
+            
+        Returns:
+            Dict mapping each key to its response, or to the exception if that call failed
+        """
+        def fetch(key):
+            try:
+                return make_request(get_service("gmail", "v1", creds), key).execute()
+            except Exception as e:
+                return e
+        
+        keys = list(keys)
+        with ThreadPoolExecutor(max_workers=max_workers or GMAIL_MAX_WORKERS) as executor:
+            return dict(zip(keys, executor.map(fetch, keys)))
+    
     # Type alias for better readability
     EmailData = Dict[str, Any]
     
@@ -143,7 +375,16 @@ try:
 except ImportError:
     # If Gmail API libraries aren't available, set flag to use mock implementation
     GMAIL_API_AVAILABLE = False
-    logger = logging.getLogger(__name__)
+
+def _mock_calendar_events(dates: List[str], title: str) -> str:
+    """Mock calendar output, for when the Calendar API isn't available or the call fails."""
+    return title + "".join(
+        f"Events for {date}:\n"
+        "  - 9:00 AM - 10:00 AM: Team Meeting\n"
+        "  - 2:00 PM - 3:00 PM: Project Review\n"
+        "Available slots: 10:00 AM - 2:00 PM, after 3:00 PM\n\n"
+        for date in dates
+    )
 
 # Helper function that is used by the tool and can be imported elsewhere
 def fetch_group_emails(
@@ -225,10 +466,12 @@ def fetch_group_emails(
             yield mock_email
             return
             
-        service = build("gmail", "v1", credentials=creds)
+        service = get_service("gmail", "v1", creds)
         
         # Calculate timestamp for filtering
-        after = int((datetime.now() - timedelta(minutes=minutes_since)).timestamp())
+        # Rounded down to the minute, so polls within the same minute send an identical query
+        # and can reuse the cached messages.list pages
+        after = int((datetime.now() - timedelta(minutes=minutes_since)).timestamp()) // 60 * 60
         
         # Construct Gmail search query
         # This query searches for:
@@ -237,7 +480,7 @@ def fetch_group_emails(
         # - Including emails from all categories (inbox, updates, promotions, etc.)
         
         # Base query with time filter
-        query = f"(to:{email_address} OR from:{email_address}) after:{after}"
+        query = f"{_query_prefix(email_address)} after:{after}"
         
         # Only include unread emails unless include_read is True
         if not include_read:
@@ -252,178 +495,192 @@ def fetch_group_emails(
         # If you want to include emails from specific categories, use:
         # query += " category:(primary OR updates OR promotions)"
         
-        # Retrieve all matching messages (handling pagination)
-        messages = []
-        nextPageToken = None
+        # Without skip_filters the thread is only used to find its latest message and that message's sender,
+        # so fetch just the headers and ordering instead of every message body in the thread
+        thread_params = {"fields": THREAD_FIELDS} if skip_filters else {
+            "format": "metadata",
+            "metadataHeaders": ["From", "Date"],
+            "fields": THREAD_METADATA_FIELDS,
+        }
+        
+        def get_message(service, message_id):
+            return service.users().messages().get(userId="me", id=message_id, fields=MESSAGE_FIELDS)
+        
+        def get_thread(service, thread_id):
+            return service.users().threads().get(userId="me", id=thread_id, **thread_params)
+        
+        # Search results are processed a page at a time, so the first emails are yielded once the first
+        # page is fetched rather than after the whole search, and only one page is held in memory
         logger.info(f"Fetching emails for {email_address} from last {minutes_since} minutes")
+        count = total = 0
+        for messages in iter_message_pages(service, query):
+            total += len(messages)
+            
+            # Fetch every thread the messages belong to through the batch endpoint
+            # This takes one HTTP round trip per GMAIL_BATCH_SIZE calls instead of one per message,
+            # and fetches each thread once per page even when several of its messages matched
+            # If a batch request fails, the same calls are made concurrently instead
+            thread_ids = {message["threadId"] for message in messages}
+            try:
+                fetched_threads = execute_batch(service, {
+                    thread_id: get_thread(service, thread_id) for thread_id in thread_ids
+                })
+            except Exception as e:
+                logger.warning(f"Batch fetch failed, fetching threads concurrently: {str(e)}")
+                fetched_threads = execute_threaded(creds, get_thread, thread_ids)
         
-        while True:
-            results = (
-                service.users()
-                .messages()
-                .list(userId="me", q=query, pageToken=nextPageToken)
-                .execute()
-            )
-            if "messages" in results:
-                new_messages = results["messages"]
-                messages.extend(new_messages)
-                logger.info(f"Found {len(new_messages)} messages in this page")
-            else:
-                logger.info("No messages found in this page")
-                
-            nextPageToken = results.get("nextPageToken")
-            if not nextPageToken:
-                logger.info(f"Total messages found: {len(messages)}")
-                break
-
-        # Process each message
-        count = 0
-        for message in messages:
+            # With skip_filters the full threads already include every message body we need
+            # Otherwise only a message that is the latest in its thread, and not sent by the user, is processed,
+            # so fetch the full payload for just those messages
+            message_ids = []
+            if not skip_filters:
+                for message in messages:
+                    thread = fetched_threads.get(message["threadId"])
+                    if thread is None or isinstance(thread, Exception):
+                        continue
+                    _sort_thread_messages(thread["messages"])
+                    last_message = thread["messages"][-1]
+                    if (
+                        message["id"] == last_message["id"]
+                        and email_address not in _headers_to_dict(last_message["payload"]["headers"]).get("From", "")
+                    ):
+                        message_ids.append(message["id"])
             try:
-                # Get full message details
-                msg = service.users().messages().get(userId="me", id=message["id"]).execute()
-                thread_id = msg["threadId"]
-                payload = msg["payload"]
-                headers = payload.get("headers", [])
+                fetched_messages = execute_batch(service, {
+                    message_id: get_message(service, message_id) for message_id in message_ids
+                })
+            except Exception as e:
+                logger.warning(f"Batch fetch failed, fetching messages concurrently: {str(e)}")
+                fetched_messages = execute_threaded(creds, get_message, message_ids)
+
+            # Process each message
+            for message in messages:
+                try:
+                    thread_id = message["threadId"]
                 
-                # Get thread details to determine conversation context
-                # Directly fetch the complete thread without any format restriction
-                # This matches the exact approach in the test code that successfully gets all messages
-                thread = service.users().threads().get(userId="me", id=thread_id).execute()
-                messages_in_thread = thread["messages"]
-                logger.info(f"Retrieved thread {thread_id} with {len(messages_in_thread)} messages")
+                    # Get thread details to determine conversation context
+                    # With skip_filters the complete thread is fetched, since the latest message's body is processed
+                    thread = fetched_threads.get(thread_id)
+                    if thread is None or isinstance(thread, Exception):
+                        thread = get_thread(service, thread_id).execute()
+                    messages_in_thread = thread["messages"]
+                    logger.debug(f"Retrieved thread {thread_id} with {len(messages_in_thread)} messages")
                 
-                # Sort messages by internalDate to ensure proper chronological ordering
-                # This ensures we correctly identify the latest message
-                if all("internalDate" in msg for msg in messages_in_thread):
-                    messages_in_thread.sort(key=lambda m: int(m.get("internalDate", 0)))
-                    logger.info(f"Sorted {len(messages_in_thread)} messages by internalDate")
-                else:
-                    # Fallback to ID-based sorting if internalDate is missing
-                    messages_in_thread.sort(key=lambda m: m["id"])
-                    logger.info(f"Sorted {len(messages_in_thread)} messages by ID (internalDate missing)")
+                    # Sort messages by internalDate to ensure proper chronological ordering
+                    # This ensures we correctly identify the latest message
+                    _sort_thread_messages(messages_in_thread)
                 
-                # Log details about the messages in the thread for debugging
-                for idx, msg in enumerate(messages_in_thread):
-                    headers = msg["payload"]["headers"]
-                    subject = next((h["value"] for h in headers if h["name"] == "Subject"), "No Subject")
-                    from_email = next((h["value"] for h in headers if h["name"] == "From"), "Unknown")
-                    date = next((h["value"] for h in headers if h["name"] == "Date"), "Unknown")
-                    logger.info(f"  Message {idx+1}/{len(messages_in_thread)}: ID={msg['id']}, Date={date}, From={from_email}")
+                    # Log details about the messages in the thread for debugging
+                    # Only walk the thread when debug logging is on, since this runs for every email
+                    if logger.isEnabledFor(logging.DEBUG):
+                        for idx, msg in enumerate(messages_in_thread):
+                            msg_headers = _headers_to_dict(msg["payload"]["headers"])
+                            logger.debug(
+                                "  Message %d/%d: ID=%s, Date=%s, From=%s",
+                                idx + 1,
+                                len(messages_in_thread),
+                                msg["id"],
+                                msg_headers.get("Date", "Unknown"),
+                                msg_headers.get("From", "Unknown"),
+                            )
                 
-                # Log thread information for debugging
-                logger.info(f"Thread {thread_id} has {len(messages_in_thread)} messages")
+                    # Log thread information for debugging
+                    logger.debug(f"Thread {thread_id} has {len(messages_in_thread)} messages")
                 
-                # Analyze the last message in the thread to determine if we need to process it
-                last_message = messages_in_thread[-1]
-                last_headers = last_message["payload"]["headers"]
+                    # Analyze the last message in the thread to determine if we need to process it
+                    last_message = messages_in_thread[-1]
+                    last_headers = _headers_to_dict(last_message["payload"]["headers"])
                 
-                # Get sender of last message
-                from_header = next(
-                    header["value"] for header in last_headers if header["name"] == "From"
-                )
-                last_from_header = next(
-                    header["value"]
-                    for header in last_message["payload"].get("headers")
-                    if header["name"] == "From"
-                )
+                    # Get sender of last message
+                    from_header = last_headers["From"]
+                    last_from_header = from_header
                 
-                # If the last message was sent by the user, mark this as a user response
-                # and don't process it further (assistant doesn't need to respond to user's own emails)
-                if email_address in last_from_header:
-                    yield {
-                        "id": message["id"],
-                        "thread_id": message["threadId"],
-                        "user_respond": True,
-                    }
-                    continue
+                    # If the last message was sent by the user, mark this as a user response
+                    # and don't process it further (assistant doesn't need to respond to user's own emails)
+                    if email_address in last_from_header:
+                        yield {
+                            "id": message["id"],
+                            "thread_id": message["threadId"],
+                            "user_respond": True,
+                        }
+                        continue
                     
-                # Check if this is a message we should process
-                is_from_user = email_address in from_header
-                is_latest_in_thread = message["id"] == last_message["id"]
+                    # Check if this is a message we should process
+                    is_from_user = email_address in from_header
+                    is_latest_in_thread = message["id"] == last_message["id"]
                 
-                # Modified logic for skip_filters:
-                # 1. When skip_filters is True, process all messages regardless of position in thread
-                # 2. When skip_filters is False, only process if it's not from user AND is latest in thread
-                should_process = skip_filters or (not is_from_user and is_latest_in_thread)
+                    # Modified logic for skip_filters:
+                    # 1. When skip_filters is True, process all messages regardless of position in thread
+                    # 2. When skip_filters is False, only process if it's not from user AND is latest in thread
+                    should_process = skip_filters or (not is_from_user and is_latest_in_thread)
                 
-                if not should_process:
-                    if is_from_user:
-                        logger.debug(f"Skipping message {message['id']}: sent by the user")
-                    elif not is_latest_in_thread:
-                        logger.debug(f"Skipping message {message['id']}: not the latest in thread")
+                    if not should_process:
+                        if is_from_user:
+                            logger.debug(f"Skipping message {message['id']}: sent by the user")
+                        elif not is_latest_in_thread:
+                            logger.debug(f"Skipping message {message['id']}: not the latest in thread")
                 
-                # Process the message if it passes our filters (or if filters are skipped)
-                if should_process:
-                    # Log detailed information about this message
-                    logger.info(f"Processing message {message['id']} from thread {thread_id}")
-                    logger.info(f"  Is latest in thread: {is_latest_in_thread}")
-                    logger.info(f"  Skip filters enabled: {skip_filters}")
+                    # Process the message if it passes our filters (or if filters are skipped)
+                    if should_process:
+                        # Log detailed information about this message
+                        logger.debug(f"Processing message {message['id']} from thread {thread_id}")
+                        logger.debug(f"  Is latest in thread: {is_latest_in_thread}")
+                        logger.debug(f"  Skip filters enabled: {skip_filters}")
                     
-                    # If the user wants to process the latest message in the thread,
-                    # use the last_message from the thread API call instead of the original message
-                    # that matched the search query
-                    if not skip_filters:
-                        # Use original message if skip_filters is False
-                        process_message = message
-                        process_payload = payload
-                        process_headers = headers
-                    else:
-                        # Use the latest message in the thread if skip_filters is True
-                        process_message = last_message
-                        process_payload = last_message["payload"]
-                        process_headers = process_payload.get("headers", [])
-                        logger.info(f"Using latest message in thread: {process_message['id']}")
+                        # If the user wants to process the latest message in the thread,
+                        # use the last_message from the thread API call instead of the original message
+                        # that matched the search query
+                        if not skip_filters:
+                            # Use original message if skip_filters is False
+                            # Its full payload was fetched above, since the thread only has its headers
+                            msg = fetched_messages.get(message["id"])
+                            if isinstance(msg, Exception):
+                                raise msg
+                            if msg is None:
+                                msg = get_message(service, message["id"]).execute()
+                            process_message = message
+                            process_payload = msg["payload"]
+                            process_headers = _headers_to_dict(process_payload.get("headers", []))
+                        else:
+                            # Use the latest message in the thread if skip_filters is True
+                            process_message = last_message
+                            process_payload = last_message["payload"]
+                            process_headers = last_headers
+                            logger.debug(f"Using latest message in thread: {process_message['id']}")
                     
-                    # Extract email metadata from headers
-                    subject = next(
-                        header["value"] for header in process_headers if header["name"] == "Subject"
-                    )
-                    from_email = next(
-                        (header["value"] for header in process_headers if header["name"] == "From"),
-                        "",
-                    ).strip()
-                    _to_email = next(
-                        (header["value"] for header in process_headers if header["name"] == "To"),
-                        "",
-                    ).strip()
+                        # Extract email metadata from headers
+                        subject = process_headers["Subject"]
+                        from_email = process_headers.get("From", "").strip()
+                        _to_email = process_headers.get("To", "").strip()
                     
-                    # Use Reply-To header if present
-                    if reply_to := next(
-                        (
-                            header["value"]
-                            for header in process_headers
-                            if header["name"] == "Reply-To"
-                        ),
-                        "",
-                    ).strip():
-                        from_email = reply_to
+                        # Use Reply-To header if present
+                        if reply_to := process_headers.get("Reply-To", "").strip():
+                            from_email = reply_to
                         
-                    # Extract and parse email timestamp
-                    send_time = next(
-                        header["value"] for header in process_headers if header["name"] == "Date"
-                    )
-                    parsed_time = parse_time(send_time)
+                        # Extract and parse email timestamp
+                        send_time = process_headers["Date"]
+                        parsed_time = parse_time(send_time)
                     
-                    # Extract email body content
-                    body = extract_message_part(process_payload)
+                        # Extract email body content
+                        body = extract_message_part(process_payload)
                     
-                    # Yield the processed email data
-                    yield {
-                        "from_email": from_email,
-                        "to_email": _to_email,
-                        "subject": subject,
-                        "page_content": body,
-                        "id": process_message["id"],
-                        "thread_id": process_message["threadId"],
-                        "send_time": parsed_time.isoformat(),
-                    }
-                    count += 1
+                        # Yield the processed email data
+                        yield {
+                            "from_email": from_email,
+                            "to_email": _to_email,
+                            "subject": subject,
+                            "page_content": body,
+                            "id": process_message["id"],
+                            "thread_id": process_message["threadId"],
+                            "send_time": parsed_time.isoformat(),
+                        }
+                        count += 1
                     
-            except Exception as e:
-                logger.warning(f"Failed to process message {message['id']}: {str(e)}")
+                except Exception as e:
+                    logger.warning(f"Failed to process message {message['id']}: {str(e)}")
 
-        logger.info(f"Found {count} emails to process out of {len(messages)} total messages.")
+        logger.info(f"Total messages found: {total}")
+        logger.info(f"Found {count} emails to process out of {total} total messages.")
     
     except Exception as e:
         logger.error(f"Error accessing Gmail API: {str(e)}")
@@ -469,22 +726,25 @@ def fetch_emails_tool(email_address: str, minutes_since: int = 30) -> str:
     if not emails:
         return "No new emails found."
     
-    result = f"Found {len(emails)} new emails:\n\n"
+    # Collect the pieces and join once, rather than copying the growing string on every +=
+    parts = [f"Found {len(emails)} new emails:\n\n"]
     
     for i, email in enumerate(emails, 1):
         if email.get("user_respond", False):
-            result += f"{i}. You already responded to this email (Thread ID: {email['thread_id']})\n\n"
+            parts.append(f"{i}. You already responded to this email (Thread ID: {email['thread_id']})\n\n")
             continue
             
-        result += f"{i}. From: {email['from_email']}\n"
-        result += f"   To: {email['to_email']}\n"
-        result += f"   Subject: {email['subject']}\n"
-        result += f"   Time: {email['send_time']}\n"
-        result += f"   ID: {email['id']}\n"
-        result += f"   Thread ID: {email['thread_id']}\n"
-        result += f"   Content: {email['page_content'][:200]}...\n\n"
-    
-    return result
+        parts.append(
+            f"{i}. From: {email['from_email']}\n"
+            f"   To: {email['to_email']}\n"
+            f"   Subject: {email['subject']}\n"
+            f"   Time: {email['send_time']}\n"
+            f"   ID: {email['id']}\n"
+            f"   Thread ID: {email['thread_id']}\n"
+            f"   Content: {email['page_content'][:200]}...\n\n"
+        )
+    
+    return "".join(parts)
 
 class SendEmailInput(BaseModel):
     """
@@ -535,20 +795,20 @@ def send_email(
             gmail_token=os.getenv("GMAIL_TOKEN"),
             gmail_secret=os.getenv("GMAIL_SECRET")
         )
-        service = build("gmail", "v1", credentials=creds)
+        service = get_service("gmail", "v1", creds)
         
         try:
             # Try to get the original message to extract headers
-            message = service.users().messages().get(userId="me", id=email_id).execute()
-            headers = message["payload"]["headers"]
+            message = service.users().messages().get(userId="me", id=email_id, fields="threadId,payload/headers").execute()
+            headers = _headers_to_dict(message["payload"]["headers"])
             
             # Extract subject with Re: prefix if not already present
-            subject = next(header["value"] for header in headers if header["name"] == "Subject")
+            subject = headers["Subject"]
             if not subject.startswith("Re:"):
                 subject = f"Re: {subject}"
                 
             # Create a reply message
-            original_from = next(header["value"] for header in headers if header["name"] == "From")
+            original_from = headers["From"]
             
             # Get thread ID from message
             thread_id = message["threadId"]
@@ -585,11 +845,15 @@ def send_email(
             .send(
                 userId="me",
                 body=body,
+                fields="id",
             )
             .execute()
         )
         
         logger.info(f"Email sent: Message ID {sent_message['id']}")
+        
+        # The sent message can show up in searches, so don't serve cached pages
+        _list_cache.clear()
         return True
         
     except Exception as e:
@@ -652,13 +916,7 @@ def get_calendar_events(dates: List[str]) -> str:
         logger.info("Gmail API not available, simulating calendar check")
         # Fallback: Return mock calendar data for demo/testing purposes
         # In production, this should use the real Google Calendar API
-        result = "Calendar events:\n\n"
-        for date in dates:
-            result += f"Events for {date}:\n"
-            result += "  - 9:00 AM - 10:00 AM: Team Meeting\n"
-            result += "  - 2:00 PM - 3:00 PM: Project Review\n"
-            result += "Available slots: 10:00 AM - 2:00 PM, after 3:00 PM\n\n"
-        return result
+        return _mock_calendar_events(dates, "Calendar events:\n\n")
         
     try:
         # Get Gmail API credentials from environment variables or local files
@@ -666,85 +924,73 @@ def get_calendar_events(dates: List[str]) -> str:
             gmail_token=os.getenv("GMAIL_TOKEN"),
             gmail_secret=os.getenv("GMAIL_SECRET")
         )
-        service = build("calendar", "v3", credentials=creds)
+        service = get_service("calendar", "v3", creds)
         
-        result = "Calendar events:\n\n"
+        # Collect the output pieces and join them once at the end
+        parts = ["Calendar events:\n\n"]
         
-        for date_str in dates:
-            # Parse date string (DD-MM-YYYY)
-            day, month, year = date_str.split("-")
-            
-            # Format start and end times for the API
-            start_time = f"{year}-{month}-{day}T00:00:00Z"
-            end_time = f"{year}-{month}-{day}T23:59:59Z"
-            
-            # Call the Calendar API
-            events_result = (
-                service.events()
-                .list(
-                    calendarId="primary",
-                    timeMin=start_time,
-                    timeMax=end_time,
-                    singleEvents=True,
-                    orderBy="startTime",
-                )
-                .execute()
+        # Parse date strings (DD-MM-YYYY)
+        days = {date_str: datetime.strptime(date_str, "%d-%m-%Y") for date_str in dates}
+        
+        # Call the Calendar API for every date in one batch HTTP request
+        events_results = execute_batch(service, {
+            date_str: service.events().list(
+                calendarId="primary",
+                timeMin=day.strftime("%Y-%m-%dT00:00:00Z"),
+                timeMax=day.strftime("%Y-%m-%dT23:59:59Z"),
+                singleEvents=True,
+                orderBy="startTime",
+                fields=EVENT_LIST_FIELDS,
             )
+            for date_str, day in days.items()
+        })
+        
+        for date_str in dates:
+            events_result = events_results[date_str]
+            if isinstance(events_result, Exception):
+                raise events_result
             
             events = events_result.get("items", [])
             
-            result += f"Events for {date_str}:\n"
+            parts.append(f"Events for {date_str}:\n")
             
             if not events:
-                result += "  No events found for this day\n"
-                result += "  Available all day\n\n"
+                parts.append("  No events found for this day\n")
+                parts.append("  Available all day\n\n")
                 continue
                 
             # Process events
+            # events.list is called with orderBy="startTime", so busy_slots is already sorted by start
             busy_slots = []
+            has_all_day = False
             for event in events:
                 start = event["start"].get("dateTime", event["start"].get("date"))
                 end = event["end"].get("dateTime", event["end"].get("date"))
                 
                 # Convert to datetime objects
                 if "T" in start:  # dateTime format
-                    start_dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
-                    end_dt = datetime.fromisoformat(end.replace("Z", "+00:00"))
+                    start_dt = _from_iso(start)
+                    end_dt = _from_iso(end)
                     
                     # Format for display
-                    start_display = start_dt.strftime("%I:%M %p")
-                    end_display = end_dt.strftime("%I:%M %p")
+                    start_display = _format_time(start_dt)
+                    end_display = _format_time(end_dt)
                     
-                    result += f"  - {start_display} - {end_display}: {event['summary']}\n"
+                    parts.append(f"  - {start_display} - {end_display}: {event['summary']}\n")
                     busy_slots.append((start_dt, end_dt))
                 else:  # all-day event
-                    result += f"  - All day: {event['summary']}\n"
-                    busy_slots.append(("all-day", "all-day"))
+                    parts.append(f"  - All day: {event['summary']}\n")
+                    has_all_day = True
             
             # Calculate available slots
-            if "all-day" in [slot[0] for slot in busy_slots]:
-                result += "  Available: No availability (all-day events)\n\n"
+            if has_all_day:
+                parts.append("  Available: No availability (all-day events)\n\n")
             else:
-                # Sort busy slots by start time
-                busy_slots.sort(key=lambda x: x[0])
-                
                 # Define working hours (9 AM to 5 PM)
                 # Note: Working hours are currently hardcoded for simplicity
                 # In production, this could be made configurable per user/organization
-                work_start = datetime(
-                    year=int(year), 
-                    month=int(month), 
-                    day=int(day), 
-                    hour=9, 
-                    minute=0
-                )
-                work_end = datetime(
-                    year=int(year), 
-                    month=int(month), 
-                    day=int(day), 
-                    hour=17, 
-                    minute=0
-                )
+                work_start = days[date_str].replace(hour=9, minute=0)
+                work_end = days[date_str].replace(hour=17, minute=0)
                 
                 # Calculate available slots
                 available_slots = []
@@ -760,29 +1006,19 @@ def get_calendar_events(dates: List[str]) -> str:
                 
                 # Format available slots
                 if available_slots:
-                    result += "  Available: "
-                    for i, (start, end) in enumerate(available_slots):
-                        start_display = start.strftime("%I:%M %p")
-                        end_display = end.strftime("%I:%M %p")
-                        result += f"{start_display} - {end_display}"
-                        if i < len(available_slots) - 1:
-                            result += ", "
-                    result += "\n\n"
+                    parts.append("  Available: " + ", ".join(
+                        f"{_format_time(start)} - {_format_time(end)}"
+                        for start, end in available_slots
+                    ) + "\n\n")
                 else:
-                    result += "  Available: No availability during working hours\n\n"
+                    parts.append("  Available: No availability during working hours\n\n")
         
-        return result
+        return "".join(parts)
         
     except Exception as e:
         logger.error(f"Error checking calendar: {str(e)}")
         # Return mock data in case of error
-        result = "Calendar events (mock due to error):\n\n"
-        for date in dates:
-            result += f"Events for {date}:\n"
-            result += "  - 9:00 AM - 10:00 AM: Team Meeting\n"
-            result += "  - 2:00 PM - 3:00 PM: Project Review\n"
-            result += "Available slots: 10:00 AM - 2:00 PM, after 3:00 PM\n\n"
-        return result
+        return _mock_calendar_events(dates, "Calendar events (mock due to error):\n\n")
 
 @tool(args_schema=CheckCalendarInput)
 def check_calendar_tool(dates: List[str]) -> str:
@@ -859,7 +1095,7 @@ def send_calendar_invite(
             gmail_token=os.getenv("GMAIL_TOKEN"),
             gmail_secret=os.getenv("GMAIL_SECRET")
         )
-        service = build("calendar", "v3", credentials=creds)
+        service = get_service("calendar", "v3", creds)
         
         # Create event details
         event = {
@@ -884,7 +1120,7 @@ def send_calendar_invite(
         }
         
         # Create the event
-        event = service.events().insert(calendarId="primary", body=event).execute()
+        event = service.events().insert(calendarId="primary", body=event, fields="htmlLink").execute()
         
         logger.info(f"Meeting created: {event.get('htmlLink')}")
         return True
@@ -940,7 +1176,10 @@ def mark_as_read(
 ):
     creds = get_credentials(gmail_token, gmail_secret)
 
-    service = build("gmail", "v1", credentials=creds)
+    service = get_service("gmail", "v1", creds)
     service.users().messages().modify(
-        userId="me", id=message_id, body={"removeLabelIds": ["UNREAD"]}
-    ).execute()
\ No newline at end of file
+        userId="me", id=message_id, body={"removeLabelIds": ["UNREAD"]}, fields="id"
+    ).execute()
+    
+    # The message no longer matches is:unread searches
+    _list_cache.clear()
\ No newline at end of file
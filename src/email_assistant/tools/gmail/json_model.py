@@ -0,0 +1,28 @@
+"""
+Response model for the Google API clients that parses JSON with orjson when it is installed.
+Full Gmail messages and threads are large JSON documents, and orjson decodes them several
+times faster than the standard library.
+"""
+
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class OrjsonModel(JsonModel):
+    """JsonModel that decodes response bodies with orjson."""
+
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Let JsonModel handle anything that isn't JSON, as it would have
+            return super().deserialize(content)
+        if self._data_wrapper and isinstance(body, dict) and "data" in body:
+            body = body["data"]
+        return body
+
+# Pass as build(..., model=RESPONSE_MODEL); None keeps the default JsonModel when orjson is missing
+RESPONSE_MODEL = OrjsonModel() if orjson is not None else None
@@ -1,20 +1,71 @@
 from typing import List, Any
+import re
 import json
-import html2text
+import logging
+import operator
+from functools import lru_cache
 
-def format_email_markdown(subject, author, to, email_thread, email_id=None):
-    """Format email details into a nicely formatted markdown string for display
+try:
+    # C-backed HTML parser, much faster than html2text's pure-Python one
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+logger = logging.getLogger(__name__)
+
+# Elements that end a line when converting HTML to text
+BLOCK_SELECTOR = "p, div, br, li, tr, h1, h2, h3, h4, h5, h6, blockquote, pre, hr, table, ul, ol"
+# Table cells, kept on their row but separated from each other
+CELL_SELECTOR = "td, th"
+
+# An email body is treated as HTML if it opens with a doctype or <html> tag, or has a <body> tag
+# near the start, so only the first HTML_SNIFF_LENGTH characters are checked
+HTML_SNIFF_LENGTH = 512
+HTML_SNIFF = re.compile(r"\s*<(?:!DOCTYPE|html)|.*?<body", re.IGNORECASE | re.DOTALL)
+
+def html_to_text(html):
+    """Convert an HTML email body to plain text, keeping links as markdown
+    
+    Uses selectolax when it is installed, and html2text otherwise.
     
     Args:
-        subject: Email subject
-        author: Email sender
-        to: Email recipient
-        email_thread: Email content
-        email_id: Optional email ID (for Gmail API)
+        html: HTML content
     """
-    id_section = f"\n**ID**: {email_id}" if email_id else ""
+    if HTMLParser is None:
+        # Imported here, since it is only needed when selectolax is missing
+        import html2text
+        h = html2text.HTML2Text()
+        h.ignore_links = False
+        h.ignore_images = True
+        h.body_width = 0  # Don't wrap text
+        return h.handle(html)
     
-    return f"""
+    tree = HTMLParser(html)
+    tree.strip_tags(["script", "style", "head"])
+    # Keep links inline as markdown, like html2text with ignore_links=False
+    for node in tree.css("a"):
+        href = node.attributes.get("href")
+        if href:
+            node.replace_with(f"[{node.text(strip=True)}]({href})")
+    # Mark where block elements start and end (Gmail puts text straight before a nested <div>),
+    # and where table cells end
+    for node in tree.css(BLOCK_SELECTOR):
+        node.insert_before("\0")
+        node.insert_after("\0")
+    for node in tree.css(CELL_SELECTOR):
+        node.insert_after("\1")
+    text = (tree.body or tree.root).text(separator="", strip=False)
+    # Collapse whitespace as a browser would, one line per block and " | " between cells
+    lines = []
+    for block in text.split("\0"):
+        cells = [" ".join(cell.split()) for cell in block.split("\1")]
+        line = " | ".join(cell for cell in cells if cell)
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+# Markdown layout shared by format_email_markdown and format_gmail_markdown
+EMAIL_MARKDOWN_TEMPLATE = """
 
 **Subject**: {subject}
 **From**: {author}
@@ -25,6 +76,22 @@ def format_email_markdown(subject, author, to, email_thread, email_id=None):
 ---
 """
 
+def format_email_markdown(subject, author, to, email_thread, email_id=None):
+    """Format email details into a nicely formatted markdown string for display
+    
+    Args:
+        subject: Email subject
+        author: Email sender
+        to: Email recipient
+        email_thread: Email content
+        email_id: Optional email ID (for Gmail API)
+    """
+    id_section = f"\n**ID**: {email_id}" if email_id else ""
+    
+    return EMAIL_MARKDOWN_TEMPLATE.format(
+        subject=subject, author=author, to=to, id_section=id_section, email_thread=email_thread
+    )
+
 def format_gmail_markdown(subject, author, to, email_thread, email_id=None):
     """Format Gmail email details into a nicely formatted markdown string for display,
     with HTML to text conversion for HTML content
@@ -39,71 +106,71 @@ def format_gmail_markdown(subject, author, to, email_thread, email_id=None):
     id_section = f"\n**ID**: {email_id}" if email_id else ""
     
     # Check if email_thread is HTML content and convert to text if needed
-    if email_thread and (email_thread.strip().startswith("<!DOCTYPE") or 
-                          email_thread.strip().startswith("<html") or
-                          "<body" in email_thread):
+    if email_thread and HTML_SNIFF.match(email_thread, 0, HTML_SNIFF_LENGTH):
         # Convert HTML to markdown text
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = True
-        h.body_width = 0  # Don't wrap text
-        email_thread = h.handle(email_thread)
+        email_thread = html_to_text(email_thread)
     
-    return f"""
+    return EMAIL_MARKDOWN_TEMPLATE.format(
+        subject=subject, author=author, to=to, id_section=id_section, email_thread=email_thread
+    )
 
-**Subject**: {subject}
-**From**: {author}
-**To**: {to}{id_section}
+def _format_email_draft(args):
+    """Format a write_email call"""
+    return f"""# Email Draft
 
-{email_thread}
+**To**: {args.get("to")}
+**Subject**: {args.get("subject")}
 
----
+{args.get("content")}
+"""
+
+def _format_calendar_invite(args):
+    """Format a schedule_meeting call"""
+    return f"""# Calendar Invite
+
+**Meeting**: {args.get("subject")}
+**Attendees**: {', '.join(args.get("attendees"))}
+**Duration**: {args.get("duration_minutes")} minutes
+**Day**: {args.get("preferred_day")}
 """
 
+def _format_question(args):
+    """Format a Question call, so questions stand out clearly"""
+    return f"""# Question for User
+
+{args.get("content")}
+"""
+
+# Display formatters for tools that have their own layout, by tool name
+DISPLAY_FORMATTERS = {
+    "write_email": _format_email_draft,
+    "schedule_meeting": _format_calendar_invite,
+    "Question": _format_question,
+}
+
 def format_for_display(tool_call):
     """Format content for display in Agent Inbox
     
     Args:
         tool_call: The tool call to format
     """
-    # Initialize empty display
-    display = ""
+    args = tool_call["args"]
+    formatter = DISPLAY_FORMATTERS.get(tool_call["name"])
+    if formatter is not None:
+        return formatter(args)
     
-    # Add tool call information
-    if tool_call["name"] == "write_email":
-        display += f"""# Email Draft
+    # Generic format for other tools
+    # Check if args is a dictionary or string
+    arguments = json.dumps(args, indent=2) if isinstance(args, dict) else args
+    return f"""# Tool Call: {tool_call["name"]}
 
-**To**: {tool_call["args"].get("to")}
-**Subject**: {tool_call["args"].get("subject")}
-
-{tool_call["args"].get("content")}
+Arguments:
+{arguments}
 """
-    elif tool_call["name"] == "schedule_meeting":
-        display += f"""# Calendar Invite
 
-**Meeting**: {tool_call["args"].get("subject")}
-**Attendees**: {', '.join(tool_call["args"].get("attendees"))}
-**Duration**: {tool_call["args"].get("duration_minutes")} minutes
-**Day**: {tool_call["args"].get("preferred_day")}
-"""
-    elif tool_call["name"] == "Question":
-        # Special formatting for questions to make them clear
-        display += f"""# Question for User
-
-{tool_call["args"].get("content")}
-"""
-    else:
-        # Generic format for other tools
-        display += f"""# Tool Call: {tool_call["name"]}
-
-Arguments:"""
-        
-        # Check if args is a dictionary or string
-        if isinstance(tool_call["args"], dict):
-            display += f"\n{json.dumps(tool_call['args'], indent=2)}\n"
-        else:
-            display += f"\n{tool_call['args']}\n"
-    return display
+# Fields pulled out of an email input, in the order parse_email and parse_gmail return them
+EMAIL_INPUT_FIELDS = operator.itemgetter("author", "to", "subject", "email_thread")
+GMAIL_INPUT_FIELDS = operator.itemgetter("from", "to", "subject", "body", "id")
 
 def parse_email(email_input: dict) -> dict:
     """Parse an email input dictionary.
@@ -122,12 +189,7 @@ def parse_email(email_input: dict) -> dict:
             - subject: Email subject line
             - email_thread: Full email content
     """
-    return (
-        email_input["author"],
-        email_input["to"],
-        email_input["subject"],
-        email_input["email_thread"],
-    )
+    return EMAIL_INPUT_FIELDS(email_input)
 
 def parse_gmail(email_input: dict) -> tuple[str, str, str, str, str]:
     """Parse an email input dictionary for Gmail, including the email ID.
@@ -153,17 +215,10 @@ def parse_gmail(email_input: dict) -> tuple[str, str, str, str, str]:
             - email_id: Email ID (or None if not available)
     """
 
-    print("!Email_input from Gmail!")
-    print(email_input)
+    logger.debug("Email_input from Gmail: %s", email_input)
 
     # Gmail schema
-    return (
-        email_input["from"],
-        email_input["to"],
-        email_input["subject"],
-        email_input["body"],
-        email_input["id"],
-    )
+    return GMAIL_INPUT_FIELDS(email_input)
     
 def extract_message_content(message) -> str:
     """Extract content from different message types as clean string.
@@ -176,26 +231,35 @@ def extract_message_content(message) -> str:
     """
     content = message.content
     
-    # Check for recursion marker in string
-    if isinstance(content, str) and '<Recursion on AIMessage with id=' in content:
-        return "[Recursive content]"
-    
     # Handle string content
     if isinstance(content, str):
+        # Check for recursion marker in string
+        if '<Recursion on AIMessage with id=' in content:
+            return "[Recursive content]"
         return content
         
     # Handle list content (AIMessage format)
+    # A list comprehension rather than a generator, since join builds a list from a generator anyway
     elif isinstance(content, list):
-        text_parts = []
-        for item in content:
-            if isinstance(item, dict) and 'text' in item:
-                text_parts.append(item['text'])
-        return "\n".join(text_parts)
+        return "\n".join([item['text'] for item in content if isinstance(item, dict) and 'text' in item])
     
     # Don't try to handle recursion to avoid infinite loops
     # Just return string representation instead
     return str(content)
 
+def _format_few_shot_example(value):
+    """Format one stored 'Email: {...} Original routing: {...} Correct routing: {...}' example"""
+    # Parse the example value string into components, in one pass over it
+    email_part, _, routing = value.partition('Original routing:')
+    original_routing, _, correct_routing = routing.partition('Correct routing:')
+    
+    # Format into clean string
+    return f"""Example:
+Email: {email_part.strip()}
+Original Classification: {original_routing.strip()}
+Correct Classification: {correct_routing.strip()}
+---"""
+
 def format_few_shot_examples(examples):
     """Format examples into a readable string representation.
 
@@ -212,39 +276,40 @@ def format_few_shot_examples(examples):
             Correct Classification: {correct_routing}
             ---
     """
-    formatted = []
-    for example in examples:
-        # Parse the example value string into components
-        email_part = example.value.split('Original routing:')[0].strip()
-        original_routing = example.value.split('Original routing:')[1].split('Correct routing:')[0].strip()
-        correct_routing = example.value.split('Correct routing:')[1].strip()
-        
-        # Format into clean string
-        formatted_example = f"""Example:
-Email: {email_part}
-Original Classification: {original_routing}
-Correct Classification: {correct_routing}
----"""
-        formatted.append(formatted_example)
-    
-    return "\n".join(formatted)
+    return "\n".join([_format_few_shot_example(example.value) for example in examples])
 
 def extract_tool_calls(messages: List[Any]) -> List[str]:
     """Extract tool call names from messages, safely handling messages without tool_calls."""
     tool_call_names = []
     for message in messages:
-        # Check if message is a dict and has tool_calls
-        if isinstance(message, dict) and message.get("tool_calls"):
-            tool_call_names.extend([call["name"].lower() for call in message["tool_calls"]])
-        # Check if message is an object with tool_calls attribute
-        elif hasattr(message, "tool_calls") and message.tool_calls:
-            tool_call_names.extend([call["name"].lower() for call in message.tool_calls])
+        # Dict messages keep tool_calls under a key, message objects as an attribute
+        tool_calls = message.get("tool_calls") if isinstance(message, dict) else getattr(message, "tool_calls", None)
+        if tool_calls:
+            tool_call_names.extend(call["name"].lower() for call in tool_calls)
     
     return tool_call_names
 
 def format_messages_string(messages: List[Any]) -> str:
     """Format messages into a single string for analysis."""
-    return '\n'.join(message.pretty_repr() for message in messages)
+    return '\n'.join([message.pretty_repr() for message in messages])
+
+@lru_cache(maxsize=32)
+def _render_mermaid_png(mermaid_syntax):
+    """Render mermaid syntax to PNG bytes, once per distinct diagram.
+    
+    Rendering is a round trip to mermaid.ink, or a headless browser launch on fallback,
+    so re-displaying an unchanged graph reuses the cached image.
+    """
+    from langchain_core.runnables.graph import MermaidDrawMethod
+    from langchain_core.runnables.graph_mermaid import draw_mermaid_png
+    try:
+        # Try the default renderer first
+        return draw_mermaid_png(mermaid_syntax)
+    except Exception:
+        # Fall back to pyppeteer if the default renderer fails
+        import nest_asyncio
+        nest_asyncio.apply()
+        return draw_mermaid_png(mermaid_syntax, draw_method=MermaidDrawMethod.PYPPETEER)
 
 def show_graph(graph, xray=False):
     """Display a LangGraph mermaid diagram with fallback rendering.
@@ -255,12 +320,4 @@ def show_graph(graph, xray=False):
         graph: The LangGraph object that has a get_graph() method
     """
     from IPython.display import Image
-    try:
-        # Try the default renderer first
-        return Image(graph.get_graph(xray=xray).draw_mermaid_png())
-    except Exception as e:
-        # Fall back to pyppeteer if the default renderer fails
-        import nest_asyncio
-        nest_asyncio.apply()
-        from langchain_core.runnables.graph import MermaidDrawMethod
-        return Image(graph.get_graph().draw_mermaid_png(draw_method=MermaidDrawMethod.PYPPETEER))
\ No newline at end of file
+    return Image(_render_mermaid_png(graph.get_graph(xray=xray).draw_mermaid()))
\ No newline at end of file
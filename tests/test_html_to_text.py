@@ -0,0 +1,56 @@
+"""HTML email bodies are converted to text without running separate lines or cells together."""
+
+import pytest
+
+from email_assistant import utils
+
+# A Gmail web reply: text sits directly before nested <div>s, with a quoted message below it
+GMAIL_REPLY = """<div dir="ltr">Hi Bob,<div><br></div><div>Can we meet <span style="color:rgb(34,34,34)">tomorrow</span> at 10am?</div><div><br></div><div>Thanks,</div><div>Alice</div></div><br><div class="gmail_quote"><div dir="ltr" class="gmail_attr">On Mon, Jun 2, 2025 at 9:14 AM Bob &lt;<a href="mailto:bob@example.com">bob@example.com</a>&gt; wrote:<br></div><blockquote class="gmail_quote" style="margin:0px 0px 0px 0.8ex;border-left:1px solid rgb(204,204,204);padding-left:1ex"><div dir="ltr">Are you free this week?</div></blockquote></div>"""
+
+GMAIL_TABLE = """<div dir="ltr"><div>Here are the numbers:</div><table border="1" cellpadding="0" cellspacing="0"><tbody><tr><th>Name</th><th>Value</th></tr><tr><td>Requests</td><td>1200</td></tr><tr><td>Errors</td><td>3</td></tr></tbody></table><div>Best,</div><div>Alice</div></div>"""
+
+@pytest.fixture(params=["selectolax", "html2text"])
+def html_to_text(request, monkeypatch):
+    """Run each test with selectolax and with the html2text fallback"""
+    if request.param == "selectolax":
+        if utils.HTMLParser is None:
+            pytest.skip("selectolax is not installed")
+    else:
+        monkeypatch.setattr(utils, "HTMLParser", None)
+    return utils.html_to_text
+
+def lines(text):
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def test_gmail_nested_divs_stay_on_separate_lines(html_to_text):
+    text = html_to_text(GMAIL_REPLY)
+    assert lines(text)[:4] == ["Hi Bob,", "Can we meet tomorrow at 10am?", "Thanks,", "Alice"]
+    assert "Are you free this week?" in text
+    assert "Hi Bob,Can" not in text
+
+def test_text_before_a_nested_div_gets_its_own_line(html_to_text):
+    text = html_to_text('<div dir="ltr">Hi Bob,<div>Can we meet tomorrow?</div></div>')
+    assert lines(text) == ["Hi Bob,", "Can we meet tomorrow?"]
+
+def test_table_cells_are_separated(html_to_text):
+    text = html_to_text(GMAIL_TABLE)
+    assert "NameValue" not in text and "Requests1200" not in text
+    assert any("Requests" in line and "1200" in line for line in lines(text))
+    assert lines(text)[0] == "Here are the numbers:"
+    assert lines(text)[-2:] == ["Best,", "Alice"]
+
+def test_selectolax_table_layout():
+    if utils.HTMLParser is None:
+        pytest.skip("selectolax is not installed")
+    assert utils.html_to_text(GMAIL_TABLE).splitlines() == [
+        "Here are the numbers:",
+        "Name | Value",
+        "Requests | 1200",
+        "Errors | 3",
+        "Best,",
+        "Alice",
+    ]
+
+def test_links_are_kept_as_markdown(html_to_text):
+    text = html_to_text('<div dir="ltr">See <a href="https://example.com/doc">the doc</a> please</div>')
+    assert "[the doc](https://example.com/doc)" in text
@@ -0,0 +1,40 @@
+"""The shared async HTTP client keeps working across event loops."""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from email_assistant.http_clients import get_http_async_client
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive, so the client pools them
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+def test_async_client_survives_closed_event_loops(server_url):
+    client = get_http_async_client()
+
+    async def get_twice():
+        # Two requests on one loop share its pooled connection
+        return [(await client.get(server_url)).text for _ in range(2)]
+
+    # Each asyncio.run closes its loop, as notebooks and evals do between runs
+    for _ in range(3):
+        assert asyncio.run(get_twice()) == ["ok", "ok"]
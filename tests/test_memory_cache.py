@@ -0,0 +1,76 @@
+"""The memory graphs share one profile cache and update queue, so profiles are never read stale."""
+
+import time
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+from langgraph.store.memory import InMemoryStore
+
+from email_assistant import email_assistant_hitl_memory, email_assistant_hitl_memory_gmail
+from email_assistant.memory import submit_memory_update
+
+NAMESPACE = ("email_assistant", "response_preferences")
+
+# Stands in for the tracing context that LangSmith keeps in context variables
+run_name = ContextVar("run_name", default=None)
+
+class FakeMemoryUpdater:
+    """Stands in for the structured-output LLM, returning a fixed new profile"""
+
+    def __init__(self, user_preferences):
+        self.user_preferences = user_preferences
+
+    def invoke(self, messages):
+        return SimpleNamespace(user_preferences=self.user_preferences)
+
+def test_update_from_one_graph_is_read_by_the_other(monkeypatch):
+    store = InMemoryStore()
+
+    # Both graphs read (and cache) the default profile
+    assert email_assistant_hitl_memory.get_memory(store, NAMESPACE, "Be brief.") == "Be brief."
+    assert email_assistant_hitl_memory_gmail.get_memory(store, NAMESPACE, "Be brief.") == "Be brief."
+
+    # The Gmail graph learns a new preference
+    monkeypatch.setattr(
+        email_assistant_hitl_memory_gmail, "get_llm_memory_updater", lambda: FakeMemoryUpdater("Be formal.")
+    )
+    email_assistant_hitl_memory_gmail.update_memory(store, NAMESPACE, [{"role": "user", "content": "Be formal."}])
+
+    assert store.get(NAMESPACE, "user_preferences").value == "Be formal."
+    assert email_assistant_hitl_memory.get_memory(store, NAMESPACE, "Be brief.") == "Be formal."
+    assert email_assistant_hitl_memory_gmail.get_memory(store, NAMESPACE, "Be brief.") == "Be formal."
+
+class SlowMemoryUpdater(FakeMemoryUpdater):
+    """Like FakeMemoryUpdater, but takes a while, as the real LLM call does"""
+
+    def invoke(self, messages):
+        time.sleep(0.2)
+        return super().invoke(messages)
+
+def test_read_waits_for_a_queued_update(monkeypatch):
+    store = InMemoryStore()
+    assert email_assistant_hitl_memory.get_memory(store, NAMESPACE, "Be brief.") == "Be brief."
+
+    monkeypatch.setattr(
+        email_assistant_hitl_memory, "get_llm_memory_updater", lambda: SlowMemoryUpdater("Be formal.")
+    )
+    future = email_assistant_hitl_memory.queue_memory_update(store, NAMESPACE, [{"role": "user", "content": "Be formal."}])
+
+    # The next agent step reads the profile while the update is still running
+    assert not future.done()
+    assert email_assistant_hitl_memory.get_memory(store, NAMESPACE, "Be brief.") == "Be formal."
+
+def test_queued_update_keeps_the_callers_context(monkeypatch):
+    store = InMemoryStore()
+    email_assistant_hitl_memory.get_memory(store, NAMESPACE, "Be brief.")
+    seen = []
+
+    def update_memory(store, namespace, messages):
+        seen.append(run_name.get())
+
+    token = run_name.set("triage_interrupt_handler")
+    try:
+        submit_memory_update(update_memory, store, NAMESPACE, []).result()
+    finally:
+        run_name.reset(token)
+    assert seen == ["triage_interrupt_handler"]
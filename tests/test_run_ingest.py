@@ -0,0 +1,95 @@
+"""Messages that fail in a Gmail batch are retried one by one, and reported if they still fail."""
+
+import asyncio
+
+from googleapiclient.errors import HttpError
+
+from email_assistant.tools.gmail import run_ingest
+
+class FakeResponse(dict):
+    status = 429
+    reason = "Too Many Requests"
+
+def rate_limited():
+    return HttpError(FakeResponse(), b"rate limited")
+
+class FakeRequest:
+    def __init__(self, service, message_id):
+        self.service = service
+        self.message_id = message_id
+
+    def execute(self, http=None, num_retries=0):
+        self.service.individual_calls.append((self.message_id, num_retries))
+        if self.message_id in self.service.always_failing:
+            raise rate_limited()
+        return {"id": self.message_id}
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batch_sizes.append(len(self.requests))
+        if self.service.batch_down:
+            raise rate_limited()
+        for request_id, request in self.requests:
+            if request.message_id in self.service.failing_in_batch:
+                self.callback(request_id, None, rate_limited())
+            else:
+                self.callback(request_id, {"id": request.message_id}, None)
+
+class FakeGmail:
+    """Just enough of the Gmail service for fetch_messages"""
+
+    def __init__(self, failing_in_batch=(), always_failing=(), batch_down=False):
+        self.failing_in_batch = set(failing_in_batch) | set(always_failing)
+        self.always_failing = set(always_failing)
+        self.batch_down = batch_down
+        self.batch_sizes = []
+        self.individual_calls = []
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, userId, id, fields):
+        return FakeRequest(self, id)
+
+def fetch(service, message_ids):
+    return asyncio.run(run_ingest.fetch_messages(service, credentials=None, message_ids=message_ids))
+
+def test_batches_hold_at_most_50_messages():
+    service = FakeGmail()
+    messages, failed_ids = fetch(service, [f"m{i}" for i in range(120)])
+    assert service.batch_sizes == [50, 50, 20]
+    assert [message["id"] for message in messages] == [f"m{i}" for i in range(120)]
+    assert failed_ids == []
+
+def test_messages_failing_in_a_batch_are_retried_individually():
+    service = FakeGmail(failing_in_batch=["m1", "m3"])
+    messages, failed_ids = fetch(service, ["m0", "m1", "m2", "m3"])
+    assert [message["id"] for message in messages] == ["m0", "m1", "m2", "m3"]
+    assert failed_ids == []
+    assert sorted(service.individual_calls) == [("m1", run_ingest.FETCH_RETRIES), ("m3", run_ingest.FETCH_RETRIES)]
+
+def test_messages_that_keep_failing_are_reported():
+    service = FakeGmail(always_failing=["m2"])
+    messages, failed_ids = fetch(service, ["m0", "m1", "m2"])
+    assert [message["id"] for message in messages] == ["m0", "m1"]
+    assert failed_ids == ["m2"]
+
+def test_every_message_is_retried_when_the_batch_endpoint_fails():
+    service = FakeGmail(batch_down=True)
+    messages, failed_ids = fetch(service, ["m0", "m1"])
+    assert [message["id"] for message in messages] == ["m0", "m1"]
+    assert failed_ids == []
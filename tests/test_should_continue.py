@@ -0,0 +1,46 @@
+"""Routing after the agent's turn: Done only ends the run when it is the only tool call."""
+
+import pytest
+from langchain_core.messages import AIMessage
+from langgraph.graph import END
+
+from email_assistant import (
+    email_assistant,
+    email_assistant_hitl,
+    email_assistant_hitl_memory,
+    email_assistant_hitl_memory_gmail,
+)
+
+def tool_call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id}
+
+# (should_continue, route for a turn with tool calls to run, route when the agent is done)
+ROUTERS = [
+    pytest.param(email_assistant.should_continue, "Action", END, id="email_assistant"),
+    pytest.param(email_assistant_hitl.should_continue, "interrupt_handler", END, id="hitl"),
+    pytest.param(
+        lambda state: email_assistant_hitl_memory.should_continue(state, None),
+        "interrupt_handler", END, id="hitl_memory",
+    ),
+    pytest.param(
+        lambda state: email_assistant_hitl_memory_gmail.should_continue(state, None),
+        "interrupt_handler", "mark_as_read_node", id="hitl_memory_gmail",
+    ),
+]
+
+def state_with(*tool_calls):
+    return {"messages": [AIMessage(content="", tool_calls=list(tool_calls))]}
+
+@pytest.mark.parametrize("should_continue, run_tools, done", ROUTERS)
+def test_done_alone_ends_the_run(should_continue, run_tools, done):
+    assert should_continue(state_with(tool_call("Done", "1", done=True))) == done
+
+@pytest.mark.parametrize("should_continue, run_tools, done", ROUTERS)
+def test_reply_with_done_runs_the_reply_first(should_continue, run_tools, done):
+    reply = tool_call("write_email", "1", to="a@example.com", subject="Re: hi", content="Hello")
+    assert should_continue(state_with(reply, tool_call("Done", "2", done=True))) == run_tools
+    assert should_continue(state_with(tool_call("Done", "2", done=True), reply)) == run_tools
+
+@pytest.mark.parametrize("should_continue, run_tools, done", ROUTERS)
+def test_tool_calls_without_done_run(should_continue, run_tools, done):
+    assert should_continue(state_with(tool_call("check_calendar_availability", "1", day="Tuesday"))) == run_tools